@@ -0,0 +1,119 @@
+from collections import OrderedDict
+import threading
+from typing import Callable, Dict, Optional
+from aimakerspace.vectordatabase import VectorDatabase
+
+
+class CollectionCache:
+    """
+    Named `VectorDatabase` collections kept under a memory budget.
+
+    Collections are evicted least-recently-used first once the resident
+    total exceeds `max_bytes`. On a miss, `loader` (if given) is asked to
+    restore the collection, e.g. from a snapshot on disk, before giving up.
+    A single collection larger than the budget is still kept, alone.
+    Sizes are measured by `put`, and again by `get` when the collection has
+    been mutated since (see `VectorDatabase.mutations`), so upserts into a
+    cached collection count against the budget.
+
+    The cache is thread-safe, so a slow `loader` can run in a worker thread
+    (e.g. via `asyncio.to_thread(cache.get, name)`). The lock is not held
+    while loading; concurrent misses on one name may load it twice, and the
+    last `put` wins.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        loader: Optional[Callable[[str], Optional[VectorDatabase]]] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self._collections: "OrderedDict[str, VectorDatabase]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._measured: Dict[str, int] = {}  # name -> `mutations` when last measured
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._collections
+
+    def __len__(self) -> int:
+        return len(self._collections)
+
+    def get(self, name: str) -> Optional[VectorDatabase]:
+        with self._lock:
+            vector_db = self._collections.get(name)
+            if vector_db is not None:
+                self.hits += 1
+                self._collections.move_to_end(name)
+                stale = vector_db.mutations != self._measured[name]
+            else:
+                self.misses += 1
+        if vector_db is not None:
+            if stale:
+                self._remeasure(name, vector_db)
+            return vector_db
+        if self.loader is None:
+            return None
+        vector_db = self.loader(name)
+        if vector_db is not None:
+            self.put(name, vector_db)
+            with self._lock:
+                self.loads += 1
+        return vector_db
+
+    def put(self, name: str, vector_db: VectorDatabase) -> None:
+        mutations = vector_db.mutations
+        size = vector_db.nbytes
+        with self._lock:
+            self._discard(name)
+            self._collections[name] = vector_db
+            self._sizes[name] = size
+            self._measured[name] = mutations
+            self.resident_bytes += size
+            self._evict()
+
+    def _remeasure(self, name: str, vector_db: VectorDatabase) -> None:
+        mutations = vector_db.mutations
+        size = vector_db.nbytes
+        with self._lock:
+            if self._collections.get(name) is not vector_db:
+                return  # replaced or evicted meanwhile
+            self.resident_bytes += size - self._sizes[name]
+            self._sizes[name] = size
+            self._measured[name] = mutations
+            self._evict()
+
+    def _evict(self) -> None:
+        while self.resident_bytes > self.max_bytes and len(self._collections) > 1:
+            oldest = next(iter(self._collections))
+            self._discard(oldest)
+            self.evictions += 1
+
+    def discard(self, name: str) -> None:
+        with self._lock:
+            self._discard(name)
+
+    def _discard(self, name: str) -> None:
+        if name in self._collections:
+            del self._collections[name]
+            del self._measured[name]
+            self.resident_bytes -= self._sizes.pop(name)
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "collections": len(self._collections),
+            "resident_bytes": self.resident_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
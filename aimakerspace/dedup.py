@@ -0,0 +1,132 @@
+import hashlib
+import zlib
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+_SHINGLE_MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+
+
+class ChunkDeduplicator:
+    """
+    Maps each chunk to a representative, so that identical and
+    near-identical chunks (repeated headers and footers, boilerplate,
+    duplicated CSV rows) are embedded and stored once.
+
+    Exact duplicates are found by content hash. Near duplicates are found
+    with MinHash over word `shingle`-grams: each chunk gets a `num_perm`
+    signature, split into `bands` LSH bands. A chunk whose estimated
+    Jaccard similarity to an earlier representative sharing one of its
+    bands reaches `threshold` is mapped to the most similar one; otherwise
+    it becomes a representative itself. A threshold of 1.0 keeps only
+    exact deduplication.
+
+    `representatives[i]` is the index of the chunk that stands for chunk
+    `i` (itself for representatives), which preserves the provenance of
+    every dropped chunk; `stats()` reports the embedding work saved.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, bands: int = 16, shingle: int = 3, seed: int = 0):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle = shingle
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hash family: h(x) = (a * x + b) mod 2**64 >> 32, odd a
+        self._a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+        self._exact: Dict[bytes, int] = {}
+        self._buckets: Dict[tuple, List[int]] = {}
+        self._signatures: Dict[int, np.ndarray] = {}
+        self.representatives: List[int] = []
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        self.bytes_total = 0
+        self.bytes_saved = 0
+
+    def __len__(self) -> int:
+        return len(self.representatives)
+
+    def signature(self, text: str) -> np.ndarray:
+        words = np.fromiter(
+            (zlib.crc32(word.encode("utf-8")) for word in text.lower().split()), dtype=np.uint64
+        )
+        width = min(self.shingle, len(words))
+        if width == 0:
+            return np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint64)
+        count = len(words) - width + 1
+        shingles = np.zeros(count, dtype=np.uint64)
+        for offset in range(width):
+            shingles += words[offset : offset + count] * _SHINGLE_MIX[offset]
+        hashes = (shingles[:, None] * self._a + self._b) >> np.uint64(32)
+        return hashes.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[tuple]:
+        return [(band, rows.tobytes()) for band, rows in enumerate(np.split(signature, self.bands))]
+
+    def _near(self, signature: np.ndarray) -> Optional[int]:
+        """The most similar representative at or above the threshold, if any."""
+        candidates = {index for key in self._band_keys(signature) for index in self._buckets.get(key, ())}
+        best, best_similarity = None, -1.0
+        for index in sorted(candidates):
+            similarity = np.mean(self._signatures[index] == signature)
+            if similarity > best_similarity:
+                best, best_similarity = index, similarity
+        return best if best_similarity >= self.threshold else None
+
+    def add(self, text: str) -> int:
+        """Registers the next chunk and returns the index of its representative."""
+        index = len(self.representatives)
+        size = len(text.encode("utf-8"))
+        self.bytes_total += size
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        representative = self._exact.get(digest)
+        if representative is not None:
+            self.exact_duplicates += 1
+        elif self.threshold < 1.0:
+            signature = self.signature(text)
+            representative = self._near(signature)
+            if representative is not None:
+                self.near_duplicates += 1
+            else:
+                self._signatures[index] = signature
+                for key in self._band_keys(signature):
+                    self._buckets.setdefault(key, []).append(index)
+        if representative is None:
+            representative = index
+        else:
+            self.bytes_saved += size
+        self._exact.setdefault(digest, representative)
+        self.representatives.append(representative)
+        return representative
+
+    def add_many(self, texts: Sequence[str]) -> List[int]:
+        return [self.add(text) for text in texts]
+
+    @property
+    def unique(self) -> List[int]:
+        """Indices of the representatives, in input order."""
+        return [i for i, representative in enumerate(self.representatives) if representative == i]
+
+    def groups(self) -> Dict[int, List[int]]:
+        """Every representative with the indices of all the chunks it stands for (itself first)."""
+        groups: Dict[int, List[int]] = {}
+        for i, representative in enumerate(self.representatives):
+            groups.setdefault(representative, []).append(i)
+        return groups
+
+    def stats(self) -> Dict[str, object]:
+        chunks = len(self.representatives)
+        saved = self.exact_duplicates + self.near_duplicates
+        return {
+            "chunks": chunks,
+            "unique": chunks - saved,
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+            "embeddings_saved": saved,
+            "bytes_saved": self.bytes_saved,
+            "bytes_saved_ratio": self.bytes_saved / self.bytes_total if self.bytes_total else 0.0,
+        }
@@ -0,0 +1,273 @@
+import numpy as np
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores along the last axis, best first, without a full sort."""
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape)
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=-1)
+
+
+class FlatIndex:
+    """
+    Exact search over every row.
+
+    Indexes receive the database's row storage (see `aimakerspace.storage`),
+    normalized queries and an optional boolean `mask` of rows that may be
+    returned, and give back (rows, scores) arrays of shape (n_queries, <=k),
+    best first; rows of -1 pad results when fewer rows qualify.
+    """
+
+    def reset(self) -> None:
+        pass
+
+    def add(self, storage, rows: np.ndarray) -> None:
+        pass
+
+    def search(
+        self, storage, queries: np.ndarray, k: int, mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if mask is None:
+            scores = storage.score(queries)
+            rows = top_k(scores, k)
+            return rows, np.take_along_axis(scores, rows, axis=-1)
+        allowed = np.flatnonzero(mask)
+        if 2 * len(allowed) < len(mask):
+            # Few rows qualify: only score those.
+            scores = storage.score(queries, allowed)
+            best = top_k(scores, k)
+            return allowed[best], np.take_along_axis(scores, best, axis=-1)
+        # Most rows qualify: a full scan is cheaper than gathering them.
+        scores = storage.score(queries)
+        scores[:, ~mask] = -np.inf
+        rows = top_k(scores, min(k, len(allowed)))
+        return rows, np.take_along_axis(scores, rows, axis=-1)
+
+
+class ShardedIndex:
+    """
+    Exact search with the rows split into contiguous shards scored in parallel.
+
+    Each shard is a zero-copy slice of the one storage buffer (or of the
+    memory-mapped snapshot), so worker threads share the rows instead of
+    copying them; NumPy releases the GIL while scoring, so shards run on
+    separate cores. Every shard yields its own top-k and the partial lists
+    are merged into the global top-k. Shards hold at least `min_shard_rows`
+    rows, so small databases are still scanned in a single pass.
+    """
+
+    def __init__(
+        self,
+        n_shards: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        min_shard_rows: int = 16384,
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.n_shards = n_shards or self.max_workers
+        self.min_shard_rows = min_shard_rows
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def reset(self) -> None:
+        pass
+
+    def add(self, storage, rows: np.ndarray) -> None:
+        pass
+
+    def close(self) -> None:
+        """Shuts the worker pool down; it is recreated on the next search."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _bounds(self, n: int) -> List[Tuple[int, int]]:
+        n_shards = max(1, min(self.n_shards, n // max(self.min_shard_rows, 1)))
+        edges = np.linspace(0, n, n_shards + 1).astype(np.int64)
+        return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+    @staticmethod
+    def _search_shard(
+        storage, queries: np.ndarray, k: int, start: int, stop: int, mask: Optional[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if mask is not None:
+            allowed = start + np.flatnonzero(mask[start:stop])
+            if 2 * len(allowed) < stop - start:
+                scores = storage.score(queries, allowed)
+                best = top_k(scores, k)
+                return allowed[best], np.take_along_axis(scores, best, axis=-1)
+        scores = storage.score(queries, slice(start, stop))
+        if mask is not None:
+            scores[:, ~mask[start:stop]] = -np.inf
+        best = top_k(scores, k)
+        return start + best, np.take_along_axis(scores, best, axis=-1)
+
+    def search(
+        self, storage, queries: np.ndarray, k: int, mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        bounds = self._bounds(len(storage))
+        if len(bounds) == 1:
+            return FlatIndex().search(storage, queries, k, mask)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        partials = list(
+            self._executor.map(lambda bound: self._search_shard(storage, queries, k, *bound, mask), bounds)
+        )
+        rows = np.concatenate([partial[0] for partial in partials], axis=1)
+        scores = np.concatenate([partial[1] for partial in partials], axis=1)
+        best = top_k(scores, k)
+        rows = np.take_along_axis(rows, best, axis=-1)
+        scores = np.take_along_axis(scores, best, axis=-1)
+        return np.where(np.isneginf(scores), -1, rows), scores
+
+
+class IVFIndex:
+    """
+    Inverted-file index with a spherical k-means coarse quantizer.
+
+    Rows are bucketed by their nearest of `nlist` centroids (default
+    sqrt(rows)) and a query only scores the rows in its `nprobe` closest
+    buckets, so latency and recall
+    both grow with `nprobe`. Training is lazy: it happens on the first
+    search once there are at least `min_train_size` rows (below that the
+    index searches exactly) and is repeated whenever the database has grown
+    to `retrain_factor` times its size at the last training.
+
+    Training, assignment and the rebuild of the per-list row order happen
+    under a lock, and a search works on the (centroids, order, offsets) it
+    read under that lock: those arrays are replaced, never modified in
+    place, so concurrent searches (e.g. from `asearch_by_text` threads)
+    never see a half-rebuilt index.
+    """
+
+    def __init__(
+        self,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        n_iter: int = 10,
+        min_train_size: int = 1024,
+        retrain_factor: float = 4.0,
+        max_train_points_per_list: int = 64,
+        seed: int = 0,
+    ):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.min_train_size = min_train_size
+        self.retrain_factor = retrain_factor
+        self.max_train_points_per_list = max_train_points_per_list
+        self.seed = seed
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def _reset(self) -> None:
+        self.centroids: Optional[np.ndarray] = None
+        self._assignments = np.empty(0, dtype=np.int32)  # row -> list id
+        self._trained_size = 0
+        self._order: Optional[np.ndarray] = None  # rows grouped by list
+        self._offsets: Optional[np.ndarray] = None  # list id -> slice of _order
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+    def _assign_rows(self, storage, rows: np.ndarray, centroids: np.ndarray, batch_size: int = 4096) -> np.ndarray:
+        assignments = np.empty(len(rows), dtype=np.int32)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start : start + batch_size]
+            assignments[start : start + batch_size] = self._assign(storage.vectors(batch), centroids)
+        return assignments
+
+    def train(self, storage) -> None:
+        with self._lock:
+            self._train(storage)
+
+    def _train(self, storage) -> None:
+        n = len(storage)
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(n, nlist * self.max_train_points_per_list)
+        sample = storage.vectors(np.sort(rng.choice(n, sample_size, replace=False)))
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(self.n_iter):
+            labels = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            # Re-seed empty clusters from random points rather than dropping them.
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            norms[empty] = 1
+            centroids = (sums / norms).astype(np.float32)
+        self._assignments = self._assign_rows(storage, np.arange(n), centroids)
+        self.centroids = centroids
+        self._trained_size = n
+        self._order = None
+
+    def add(self, storage, rows: np.ndarray) -> None:
+        with self._lock:
+            if not self.is_trained or len(rows) == 0:
+                return
+            if len(self._assignments) < len(storage):
+                grown = np.empty(len(storage), dtype=np.int32)
+                grown[: len(self._assignments)] = self._assignments
+                self._assignments = grown
+            self._assignments[rows] = self._assign_rows(storage, rows, self.centroids)
+            self._order = None
+
+    def _lists(self, storage) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """(centroids, order, offsets) to search `storage` with, training first if due; None below `min_train_size`."""
+        n = len(storage)
+        if n < self.min_train_size:
+            return None
+        with self._lock:
+            if not self.is_trained or n >= self.retrain_factor * self._trained_size:
+                self._train(storage)
+            if self._order is None:
+                assignments = self._assignments[:n]
+                self._order = np.argsort(assignments, kind="stable")
+                counts = np.bincount(assignments, minlength=len(self.centroids))
+                self._offsets = np.concatenate(([0], np.cumsum(counts)))
+            return self.centroids, self._order, self._offsets
+
+    def search(
+        self, storage, queries: np.ndarray, k: int, mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        trained = self._lists(storage)
+        if trained is None:
+            return FlatIndex().search(storage, queries, k, mask)
+        centroids, order, offsets = trained
+        nprobe = min(self.nprobe, len(centroids))
+        probes = top_k(queries @ centroids.T, nprobe)
+        k = min(k, len(storage))
+        rows_out = np.full((len(queries), k), -1, dtype=np.int64)
+        scores_out = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for i, (query, lists) in enumerate(zip(queries, probes)):
+            candidates = np.concatenate(
+                [order[offsets[l] : offsets[l + 1]] for l in lists]
+            )
+            if mask is not None:
+                candidates = candidates[mask[candidates]]
+            scores = storage.score(query[None], candidates)[0]
+            best = top_k(scores, k)
+            rows_out[i, : len(best)] = candidates[best]
+            scores_out[i, : len(best)] = scores[best]
+        return rows_out, scores_out
@@ -0,0 +1,212 @@
+import numpy as np
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+import re
+import sys
+
+from aimakerspace.indexes import top_k
+from aimakerspace.storage import load_array
+
+
+_WORD = re.compile(r"\w+")
+# Identifiers such as "INV-2023-001", "v1.2.3" or "snake_case" are also
+# indexed whole, so exact codes outrank documents sharing only their parts.
+_COMPOUND = re.compile(r"\w+(?:[-./]\w+)+")
+_INT_SIZE = sys.getsizeof(2**30)
+_ARRAY_SIZE = sys.getsizeof(np.empty(0))
+
+
+def tokenize(text: str) -> List[str]:
+    text = text.lower()
+    return _WORD.findall(text) + _COMPOUND.findall(text)
+
+
+class BM25Index:
+    """
+    Inverted index with Okapi BM25 scoring, row-aligned with a VectorDatabase.
+
+    Postings are kept per term as parallel (row, term frequency) lists and
+    frozen into NumPy arrays on first use after a change, so a query costs
+    one vectorized update per query term rather than a pass over all rows.
+    `save` writes every term's postings as one CSR layout; `load` maps them
+    back as frozen views without re-tokenizing, and a loaded term only turns
+    into lists again when a row containing it changes.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._frozen: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._lengths: List[int] = []
+        self._lengths_array: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate heap size of the postings, their frozen arrays and the row lengths."""
+        size = sys.getsizeof(self._postings) + sys.getsizeof(self._frozen) + sys.getsizeof(self._lengths)
+        # Row numbers are int objects shared by every posting list of their row
+        size += _INT_SIZE * len(self._lengths)
+        for term, (rows, frequencies) in self._postings.items():
+            size += sys.getsizeof(term) + sys.getsizeof((rows, frequencies))
+            size += sys.getsizeof(rows) + sys.getsizeof(frequencies)
+        for term, (rows, frequencies) in self._frozen.items():
+            size += rows.nbytes + frequencies.nbytes + 2 * _ARRAY_SIZE
+            if term not in self._postings:
+                size += sys.getsizeof(term) + sys.getsizeof((rows, frequencies))
+        if self._lengths_array is not None:
+            size += self._lengths_array.nbytes
+        return size
+
+    def append(self, texts: List[str]) -> None:
+        for text in texts:
+            self._lengths.append(0)
+            self._index_row(len(self._lengths) - 1, text)
+
+    def _index_row(self, row: int, text: str) -> None:
+        counts = Counter(tokenize(text))
+        self._lengths[row] = sum(counts.values())
+        self._lengths_array = None
+        for term, count in counts.items():
+            rows, frequencies = self._mutable_postings(term)
+            rows.append(row)
+            frequencies.append(count)
+            self._frozen.pop(term, None)
+
+    def update(self, row: int, old_text: str, new_text: str) -> None:
+        """Re-indexes a row whose text changed from `old_text` to `new_text`."""
+        for term in set(tokenize(old_text)):
+            rows, frequencies = self._mutable_postings(term)
+            position = rows.index(row)
+            del rows[position], frequencies[position]
+            self._frozen.pop(term, None)
+        self._index_row(row, new_text)
+
+    def compact(self, rows: np.ndarray) -> None:
+        """Keeps only `rows`, in that order, renumbering the postings."""
+        new_rows = np.full(len(self._lengths), -1, dtype=np.int64)
+        new_rows[rows] = np.arange(len(rows))
+        postings = {}
+        for term in set(self._postings) | set(self._frozen):
+            old, frequencies = self._term_postings(term)
+            renumbered = new_rows[old]
+            kept = renumbered >= 0
+            if kept.any():
+                postings[term] = (renumbered[kept].tolist(), frequencies[kept].astype(int).tolist())
+        lengths = [self._lengths[row] for row in rows]
+        self.__init__(self.k1, self.b)
+        self._postings = postings
+        self._lengths = lengths
+
+    def _mutable_postings(self, term: str) -> Tuple[List[int], List[int]]:
+        """A term's postings as lists, converted from its arrays if it was loaded."""
+        postings = self._postings.get(term)
+        if postings is None:
+            frozen = self._frozen.get(term)
+            postings = ([], []) if frozen is None else (frozen[0].tolist(), frozen[1].astype(int).tolist())
+            self._postings[term] = postings
+        return postings
+
+    def _term_postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        frozen = self._frozen.get(term)
+        if frozen is None and term in self._postings:
+            rows, frequencies = self._postings[term]
+            frozen = (np.array(rows, dtype=np.int64), np.array(frequencies, dtype=np.float32))
+            self._frozen[term] = frozen
+        return frozen
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every row for `query` (0 for rows sharing no term)."""
+        n = len(self._lengths)
+        scores = np.zeros(n, dtype=np.float32)
+        if n == 0:
+            return scores
+        if self._lengths_array is None:
+            self._lengths_array = np.asarray(self._lengths, dtype=np.float32)
+        lengths = self._lengths_array
+        average_length = max(float(lengths.mean()), 1.0)
+        for term in set(tokenize(query)):
+            postings = self._term_postings(term)
+            if postings is None or len(postings[0]) == 0:
+                continue
+            rows, frequencies = postings
+            idf = np.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[rows] / average_length)
+            scores[rows] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+        return scores
+
+    def save(self, path: str) -> None:
+        """
+        Writes `lexical.json` (parameters and terms), the concatenated
+        postings of all terms (`lexical.rows.i32`, `lexical.freqs.f32`) with
+        per-term `lexical.offsets.i64`, and the row lengths.
+        """
+        terms = list(set(self._postings) | set(self._frozen))
+        postings = []
+        for term in terms:
+            # Not via _term_postings: freezing every term would double the index in memory
+            frozen = self._frozen.get(term)
+            postings.append(frozen if frozen is not None else self._postings[term])
+        counts = np.fromiter((len(rows) for rows, _ in postings), dtype=np.int64, count=len(postings))
+        np.concatenate(([0], np.cumsum(counts))).astype(np.int64).tofile(os.path.join(path, "lexical.offsets.i64"))
+        rows = [np.asarray(rows, dtype=np.int32) for rows, _ in postings]
+        frequencies = [np.asarray(frequencies, dtype=np.float32) for _, frequencies in postings]
+        np.concatenate(rows or [np.empty(0, dtype=np.int32)]).tofile(os.path.join(path, "lexical.rows.i32"))
+        np.concatenate(frequencies or [np.empty(0, dtype=np.float32)]).tofile(os.path.join(path, "lexical.freqs.f32"))
+        np.asarray(self._lengths, dtype=np.float32).tofile(os.path.join(path, "lexical.lengths.f32"))
+        with open(os.path.join(path, "lexical.json"), "w", encoding="utf-8") as f:
+            # json.dumps uses the C encoder; json.dump streams through the Python one
+            f.write(json.dumps({"k1": self.k1, "b": self.b, "terms": terms}, ensure_ascii=False, separators=(",", ":")))
+
+    def load(self, path: str, mmap: bool) -> bool:
+        """Fills the index from `save` output; False if the snapshot has none."""
+        header_path = os.path.join(path, "lexical.json")
+        if not os.path.exists(header_path):
+            return False
+        with open(header_path, "r", encoding="utf-8") as f:
+            header = json.load(f)
+        offsets = np.fromfile(os.path.join(path, "lexical.offsets.i64"), dtype=np.int64).tolist()
+        total = offsets[-1]
+        # Plain ndarray views: slicing a np.memmap would wrap every slice in a memmap
+        rows = np.asarray(load_array(os.path.join(path, "lexical.rows.i32"), np.int32, (total,), mmap))
+        frequencies = np.asarray(load_array(os.path.join(path, "lexical.freqs.f32"), np.float32, (total,), mmap))
+        lengths = np.fromfile(os.path.join(path, "lexical.lengths.f32"), dtype=np.float32)
+        self.__init__(header["k1"], header["b"])
+        self._frozen = {
+            term: (rows[start:end], frequencies[start:end])
+            for term, start, end in zip(header["terms"], offsets[:-1], offsets[1:])
+        }
+        self._lengths = lengths.astype(np.int64).tolist()
+        self._lengths_array = lengths
+        return True
+
+    def search(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (rows, scores) among rows that match at least one query term."""
+        scores = self.scores(query)
+        if mask is not None:
+            scores[~mask] = 0
+        matching = np.flatnonzero(scores > 0)
+        best = top_k(scores[matching], k)
+        return matching[best], scores[matching[best]]
+
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], k: int, rrf_k: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fuses ranked row lists with RRF: each row scores sum(1 / (rrf_k + rank)).
+
+    Returns the top-k (rows, fused scores).
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            if row >= 0:
+                fused[int(row)] = fused.get(int(row), 0.0) + 1.0 / (rrf_k + rank + 1)
+    rows = np.fromiter(fused.keys(), dtype=np.int64, count=len(fused))
+    scores = np.fromiter(fused.values(), dtype=np.float64, count=len(fused))
+    best = top_k(scores, k)
+    return rows[best], scores[best]
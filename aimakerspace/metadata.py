@@ -0,0 +1,289 @@
+import numpy as np
+from typing import Any, Dict, Hashable, List, Optional, Union
+import json
+import os
+import sys
+
+from aimakerspace.storage import load_array
+
+
+_RANGE_OPERATORS = {
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+}
+_INT_SIZE = sys.getsizeof(2**30)
+
+
+def validate_where(where: Dict[str, Any]) -> None:
+    """Raises ValueError for a filter that `MetadataIndex.mask` cannot evaluate."""
+    if not isinstance(where, dict):
+        raise ValueError(f"Filter must map fields to conditions, got {type(where).__name__}")
+    for field, condition in where.items():
+        if isinstance(condition, dict):
+            for operator, bound in condition.items():
+                if operator not in _RANGE_OPERATORS:
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+                if isinstance(bound, bool) or not isinstance(bound, (int, float)):
+                    raise ValueError(f"Bound of {operator} on {field!r} must be a number, got {bound!r}")
+        else:
+            values = condition if isinstance(condition, (list, tuple, set)) else [condition]
+            for value in values:
+                if not isinstance(value, Hashable):
+                    raise ValueError(f"Filter value for {field!r} must be a scalar, got {value!r}")
+
+
+class MetadataIndex:
+    """
+    Row-aligned metadata columns with posting lists for filtering.
+
+    Each field is stored as a column (one value per row, None when absent)
+    and every (field, value) pair keeps a posting list of rows, so an
+    equality or membership filter becomes a union of precomputed row sets
+    rather than a scan. Range filters use a cached numeric view of the
+    column. `mask(where)` evaluates a filter to a boolean row mask:
+
+        {"page": 3}                          equality
+        {"page": [3, 4]}                     membership
+        {"page": {"$gte": 3, "$lt": 10}}     range (numeric fields)
+        {"source": "a.pdf", "page": 3}       all conditions must hold
+
+    `save` writes the posting lists as one CSR layout and `load` reads them
+    back as array views alongside the columns, instead of re-inserting row
+    by row; a loaded posting list only becomes a list again when one of its
+    rows changes.
+
+    A row can also carry aliases (`add_aliases`): metadata of other content
+    it stands for, such as the spans of duplicate chunks that were not
+    stored. A filter matches the row if it matches the row's own metadata
+    or any one alias; aliases live in a nested index of their own.
+    """
+
+    def __init__(self):
+        self.columns: Dict[str, List[Any]] = {}
+        self._postings: Dict[str, Dict[Hashable, Union[List[int], np.ndarray]]] = {}
+        self._posting_arrays: Dict[tuple, np.ndarray] = {}
+        self._numeric: Dict[str, np.ndarray] = {}
+        self._size = 0
+        self._aliases: Optional["MetadataIndex"] = None
+        self._row_aliases: Dict[int, List[int]] = {}  # row -> its rows in `_aliases`
+        self._alias_owners: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate heap size of the columns, posting lists and cached arrays."""
+        # Row numbers are int objects shared by the posting lists of their row
+        size = sys.getsizeof(self.columns) + sys.getsizeof(self._postings) + _INT_SIZE * self._size
+        for field, column in self.columns.items():
+            size += sys.getsizeof(field) + sys.getsizeof(column) + sys.getsizeof(self._postings[field])
+            for value, rows in self._postings[field].items():
+                size += sys.getsizeof(value) + sys.getsizeof(rows)
+                if isinstance(rows, np.ndarray):
+                    size += rows.nbytes  # a view of the loaded arrays
+        size += sum(cached.nbytes for cached in self._posting_arrays.values())
+        size += sum(column.nbytes for column in self._numeric.values())
+        if self._aliases is not None:
+            size += self._aliases.nbytes + sys.getsizeof(self._row_aliases)
+            size += sum(_INT_SIZE + sys.getsizeof(aliases) for aliases in self._row_aliases.values())
+            if self._alias_owners is not None:
+                size += self._alias_owners.nbytes
+        return size
+
+    def _invalidate(self, field: str) -> None:
+        self._numeric.pop(field, None)
+        for cached in [cached for cached in self._posting_arrays if cached[0] == field]:
+            del self._posting_arrays[cached]
+
+    def append(self, metadatas: List[Optional[Dict[str, Any]]]) -> None:
+        start = self._size
+        self._size += len(metadatas)
+        for column in self.columns.values():
+            column.extend([None] * len(metadatas))
+        for offset, metadata in enumerate(metadatas):
+            if metadata:
+                self._set_row(start + offset, metadata)
+
+    def update(self, row: int, metadata: Optional[Dict[str, Any]]) -> None:
+        """Replaces all metadata of a row, dropping its aliases."""
+        aliases = self._row_aliases.pop(row, None)
+        if aliases is not None:
+            for alias in aliases:
+                self._aliases.update(alias, None)
+            self._alias_owners = None
+        for field, column in self.columns.items():
+            value = column[row]
+            if value is not None:
+                self._posting_list(field, value).remove(row)
+                column[row] = None
+                self._invalidate(field)
+        if metadata:
+            self._set_row(row, metadata)
+
+    def _set_row(self, row: int, metadata: Dict[str, Any]) -> None:
+        for field, value in metadata.items():
+            if value is None:
+                continue
+            column = self.columns.get(field)
+            if column is None:
+                column = self.columns[field] = [None] * self._size
+                self._postings[field] = {}
+            column[row] = value
+            self._posting_list(field, value).append(row)
+            self._invalidate(field)
+
+    def _posting_list(self, field: str, value: Hashable) -> List[int]:
+        postings = self._postings[field]
+        rows = postings.get(value)
+        if not isinstance(rows, list):
+            rows = postings[value] = [] if rows is None else rows.tolist()
+        return rows
+
+    def get(self, row: int) -> Dict[str, Any]:
+        return {field: column[row] for field, column in self.columns.items() if column[row] is not None}
+
+    def add_aliases(self, row: int, metadatas: List[Dict[str, Any]]) -> None:
+        """Lets filters also match `row` through each of `metadatas`."""
+        if not metadatas:
+            return
+        if self._aliases is None:
+            self._aliases = MetadataIndex()
+        start = len(self._aliases)
+        self._aliases.append(metadatas)
+        self._row_aliases.setdefault(row, []).extend(range(start, start + len(metadatas)))
+        self._alias_owners = None
+
+    def aliases(self, row: int) -> List[Dict[str, Any]]:
+        return [self._aliases.get(alias) for alias in self._row_aliases.get(row, [])]
+
+    def _owners(self) -> np.ndarray:
+        """The row each alias belongs to (-1 once dropped)."""
+        if self._alias_owners is None:
+            owners = np.full(len(self._aliases), -1, dtype=np.int64)
+            for row, aliases in self._row_aliases.items():
+                owners[aliases] = row
+            self._alias_owners = owners
+        return self._alias_owners
+
+    def compact(self, rows: np.ndarray) -> None:
+        """Keeps only `rows`, in that order, rebuilding the posting lists."""
+        columns = {field: [column[row] for row in rows] for field, column in self.columns.items()}
+        aliases = self._aliases
+        row_aliases = [(new, self._row_aliases.get(int(old))) for new, old in enumerate(rows)]
+        row_aliases = [(row, old_aliases) for row, old_aliases in row_aliases if old_aliases]
+        self.__init__()
+        self.append([{} for _ in rows])
+        for field, column in columns.items():
+            for row, value in enumerate(column):
+                if value is not None:
+                    self._set_row(row, {field: value})
+        if row_aliases:
+            aliases.compact(np.array([alias for _, old_aliases in row_aliases for alias in old_aliases]))
+            self._aliases = aliases
+            start = 0
+            for row, old_aliases in row_aliases:
+                self._row_aliases[row] = list(range(start, start + len(old_aliases)))
+                start += len(old_aliases)
+
+    def save(self, path: str) -> None:
+        """
+        Writes `metadata.json` (columns, and the values of each field that
+        have postings) and their concatenated posting lists
+        (`metadata.rows.i32`) with per-value `metadata.offsets.i64`.
+        Aliases are saved the same way under `metadata.aliases/`, with the
+        row each belongs to in the header.
+        """
+        values = {
+            field: [value for value, rows in postings.items() if len(rows)] for field, postings in self._postings.items()
+        }
+        postings = [self._postings[field][value] for field in values for value in values[field]]
+        counts = np.fromiter((len(rows) for rows in postings), dtype=np.int64, count=len(postings))
+        np.concatenate(([0], np.cumsum(counts))).astype(np.int64).tofile(os.path.join(path, "metadata.offsets.i64"))
+        rows = np.fromiter((row for rows in postings for row in rows), dtype=np.int32, count=int(counts.sum()))
+        rows.tofile(os.path.join(path, "metadata.rows.i32"))
+        with open(os.path.join(path, "metadata.json"), "w", encoding="utf-8") as f:
+            # json.dumps uses the C encoder; json.dump streams through the Python one
+            header = {"size": self._size, "columns": self.columns, "values": values}
+            if self._aliases is not None:
+                header["alias_owners"] = self._owners().tolist()
+            f.write(json.dumps(header, ensure_ascii=False, separators=(",", ":")))
+        if self._aliases is not None:
+            os.makedirs(os.path.join(path, "metadata.aliases"), exist_ok=True)
+            self._aliases.save(os.path.join(path, "metadata.aliases"))
+
+    def load(self, path: str, mmap: bool) -> bool:
+        """Fills the index from `save` output; False if the snapshot has none."""
+        header_path = os.path.join(path, "metadata.json")
+        if not os.path.exists(header_path):
+            return False
+        with open(header_path, "r", encoding="utf-8") as f:
+            header = json.load(f)
+        offsets = np.fromfile(os.path.join(path, "metadata.offsets.i64"), dtype=np.int64).tolist()
+        # Plain ndarray views: slicing a np.memmap would wrap every slice in a memmap
+        rows = np.asarray(load_array(os.path.join(path, "metadata.rows.i32"), np.int32, (offsets[-1],), mmap))
+        self.__init__()
+        self._size = header["size"]
+        self.columns = header["columns"]
+        position = 0
+        for field, values in header["values"].items():
+            postings = self._postings[field] = {}
+            for value in values:
+                postings[value] = rows[offsets[position] : offsets[position + 1]]
+                position += 1
+        if header.get("alias_owners") is not None:
+            self._aliases = MetadataIndex()
+            self._aliases.load(os.path.join(path, "metadata.aliases"), mmap)
+            for alias, row in enumerate(header["alias_owners"]):
+                if row >= 0:
+                    self._row_aliases.setdefault(row, []).append(alias)
+        return True
+
+    def _rows(self, field: str, value: Hashable) -> np.ndarray:
+        cached = self._posting_arrays.get((field, value))
+        if cached is None:
+            rows = self._postings.get(field, {}).get(value, [])
+            if isinstance(rows, np.ndarray):
+                return rows
+            cached = np.array(rows, dtype=np.int64)
+            self._posting_arrays[(field, value)] = cached
+        return cached
+
+    def _numeric_column(self, field: str) -> np.ndarray:
+        column = self._numeric.get(field)
+        if column is None:
+            column = np.array(
+                [value if isinstance(value, (int, float)) else np.nan for value in self.columns[field]],
+                dtype=np.float64,
+            )
+            self._numeric[field] = column
+        return column
+
+    def mask(self, where: Dict[str, Any], n_rows: Optional[int] = None) -> np.ndarray:
+        validate_where(where)
+        n_rows = self._size if n_rows is None else n_rows
+        mask = self._own_mask(where, n_rows)
+        if self._aliases is not None:
+            owners = self._owners()[self._aliases.mask(where)]
+            mask[owners[(owners >= 0) & (owners < n_rows)]] = True
+        return mask
+
+    def _own_mask(self, where: Dict[str, Any], n_rows: int) -> np.ndarray:
+        mask = np.ones(n_rows, dtype=bool)
+        for field, condition in where.items():
+            if field not in self.columns:
+                return np.zeros(n_rows, dtype=bool)
+            if isinstance(condition, dict):
+                column = self._numeric_column(field)
+                for operator, bound in condition.items():
+                    with np.errstate(invalid="ignore"):
+                        mask &= _RANGE_OPERATORS[operator](column, bound)
+            else:
+                values = condition if isinstance(condition, (list, tuple, set)) else [condition]
+                matches = np.zeros(n_rows, dtype=bool)
+                for value in values:
+                    matches[self._rows(field, value)] = True
+                mask &= matches
+        return mask
@@ -0,0 +1,108 @@
+import numpy as np
+from typing import Callable, Dict, Optional, Union
+
+
+class Metric:
+    """
+    A batched similarity/distance measure.
+
+    `score(storage, queries, rows)` receives the raw (un-normalized) float32
+    queries, shape (q, dim), and returns a (q, n) array against the given
+    storage rows (all rows when `rows` is None). `higher_is_better` tells the
+    search which end of the scores to keep.
+    """
+
+    def __init__(self, name: str, score: Callable, higher_is_better: bool = True):
+        self.name = name
+        self.score = score
+        self.higher_is_better = higher_is_better
+
+    def __repr__(self) -> str:
+        return f"Metric({self.name!r}, higher_is_better={self.higher_is_better})"
+
+
+METRICS: Dict[str, Metric] = {}
+
+
+def register_metric(name: str, higher_is_better: bool = True) -> Callable[[Callable], Callable]:
+    """Decorator adding a batched `score(storage, queries, rows)` function to `METRICS`."""
+
+    def decorator(score: Callable) -> Callable:
+        METRICS[name] = Metric(name, score, higher_is_better)
+        return score
+
+    return decorator
+
+
+def get_metric(distance_measure: Union[str, Metric, Callable]) -> Optional[Metric]:
+    """
+    Resolves a metric name, `Metric` or registered pairwise function; returns
+    None for arbitrary callables, which search scores pair by pair.
+    """
+    if isinstance(distance_measure, Metric):
+        return distance_measure
+    if isinstance(distance_measure, str):
+        if distance_measure not in METRICS:
+            raise ValueError(f"Unknown metric: {distance_measure}. Available: {sorted(METRICS)}")
+        return METRICS[distance_measure]
+    return _PAIRWISE_EQUIVALENTS.get(distance_measure)
+
+
+def _unit(queries: np.ndarray):
+    norms = np.linalg.norm(queries, axis=1)
+    return queries / np.where(norms == 0, 1, norms)[:, None], norms
+
+
+def _row_norms(storage, rows: Optional[np.ndarray]) -> np.ndarray:
+    return storage.norms if rows is None else storage.norms[rows]
+
+
+@register_metric("cosine")
+def cosine(storage, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    # Rows are stored pre-normalized, so cosine is a plain inner product.
+    unit, _ = _unit(queries)
+    return storage.score(unit, rows)
+
+
+@register_metric("dot")
+def dot(storage, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    unit, query_norms = _unit(queries)
+    return storage.score(unit, rows) * query_norms[:, None] * _row_norms(storage, rows)[None, :]
+
+
+@register_metric("neg_l2")
+def neg_l2(storage, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    # ||x - q||^2 = ||x||^2 + ||q||^2 - 2 x.q, with x.q recovered from the cosine.
+    unit, query_norms = _unit(queries)
+    row_norms = _row_norms(storage, rows)
+    products = storage.score(unit, rows) * query_norms[:, None] * row_norms[None, :]
+    squared = row_norms[None, :] ** 2 + query_norms[:, None] ** 2 - 2 * products
+    return -np.sqrt(np.maximum(squared, 0))
+
+
+@register_metric("manhattan", higher_is_better=False)
+def manhattan(
+    storage, queries: np.ndarray, rows: Optional[np.ndarray] = None, block_size: int = 1024
+) -> np.ndarray:
+    # Not expressible through inner products, so rows are decoded in
+    # cache-sized blocks and differenced in place in one reused buffer.
+    rows = np.arange(len(storage)) if rows is None else rows
+    distances = np.empty((len(queries), len(rows)), dtype=np.float32)
+    buffer = np.empty((min(block_size, len(rows)), queries.shape[1]), dtype=np.float32)
+    for start in range(0, len(rows), block_size):
+        block_rows = rows[start : start + block_size]
+        block = storage.vectors(block_rows) * storage.norms[block_rows, None]
+        work = buffer[: len(block_rows)]
+        for i, query in enumerate(queries):
+            np.subtract(block, query, out=work)
+            np.abs(work, out=work)
+            distances[i, start : start + len(block_rows)] = work.sum(axis=1)
+    return distances
+
+
+_PAIRWISE_EQUIVALENTS: Dict[Callable, Metric] = {}
+
+
+def register_pairwise_equivalent(function: Callable, metric_name: str) -> None:
+    """Lets a pairwise function passed as `distance_measure` use a batched metric instead."""
+    _PAIRWISE_EQUIVALENTS[function] = METRICS[metric_name]
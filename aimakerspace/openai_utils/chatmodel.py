@@ -1,7 +1,8 @@
-from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
 import os
 
+from aimakerspace.openai_utils.client_pool import default_client_pool
+
 load_dotenv()
 
 
@@ -16,7 +17,7 @@ class ChatOpenAI:
         if not isinstance(messages, list):
             raise ValueError("messages must be a list")
 
-        client = OpenAI()
+        client = default_client_pool().client(self.openai_api_key)
         response = client.chat.completions.create(
             model=self.model_name, messages=messages, **kwargs
         )
@@ -30,7 +31,7 @@ class ChatOpenAI:
         if not isinstance(messages, list):
             raise ValueError("messages must be a list")
         
-        client = AsyncOpenAI()
+        client = default_client_pool().async_client(self.openai_api_key)
 
         stream = await client.chat.completions.create(
             model=self.model_name,
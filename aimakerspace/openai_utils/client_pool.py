@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from openai import AsyncOpenAI, OpenAI
+
+
+_Key = Tuple[str, str, Optional[str], Optional[asyncio.AbstractEventLoop]]  # (kind, api_key, project, loop)
+
+
+class ClientPool:
+    """
+    Shared `OpenAI` / `AsyncOpenAI` clients keyed by (api_key, project),
+    async ones also by the event loop they are created on: their
+    connections belong to that loop, so `async_client` never hands a
+    client to another loop (e.g. a second `asyncio.run`).
+
+    Each client owns an HTTP connection pool, so reusing it keeps
+    connections (and their TLS sessions) alive between requests instead of
+    handshaking on every call. At most `max_size` clients are kept; the
+    least recently used one is closed when that is exceeded, and clients
+    unused for `idle_timeout` seconds (or whose loop has closed) are closed
+    on the next access. Async clients are closed by a task on their own
+    loop, which the pool keeps a reference to until it is done.
+    Per-call settings such as `max_retries` should go through
+    `client.with_options(...)`, which shares the pooled connections.
+    """
+
+    def __init__(self, max_size: int = 32, idle_timeout: float = 300.0):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._clients: "OrderedDict[_Key, Union[OpenAI, AsyncOpenAI]]" = OrderedDict()
+        self._last_used: Dict[_Key, float] = {}
+        self._lock = threading.Lock()
+        self._closing: Set[asyncio.Task] = set()
+        self.created = 0
+        self.reused = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def client(self, api_key: str, project: Optional[str] = None) -> OpenAI:
+        return self._get(("sync", api_key, project, None))
+
+    def async_client(self, api_key: str, project: Optional[str] = None) -> AsyncOpenAI:
+        """A client for the running event loop; must be called from a coroutine."""
+        return self._get(("async", api_key, project, asyncio.get_running_loop()))
+
+    def _get(self, key: _Key):
+        now = time.monotonic()
+        with self._lock:
+            stale = self._expire(now)
+            client = self._clients.get(key)
+            if client is not None:
+                self.reused += 1
+                self._clients.move_to_end(key)
+            else:
+                kind, api_key, project, _ = key
+                client_class = OpenAI if kind == "sync" else AsyncOpenAI
+                client = self._clients[key] = client_class(api_key=api_key, project=project)
+                self.created += 1
+                while len(self._clients) > self.max_size:
+                    stale.append(self._pop(next(iter(self._clients))))
+            self._last_used[key] = now
+        for stale_key, stale_client in stale:
+            self._close(stale_key, stale_client)
+        return client
+
+    def _pop(self, key: _Key) -> Tuple[_Key, Union[OpenAI, AsyncOpenAI]]:
+        self._last_used.pop(key)
+        self.evictions += 1
+        return key, self._clients.pop(key)
+
+    def _expire(self, now: float) -> List[Tuple[_Key, Union[OpenAI, AsyncOpenAI]]]:
+        expired = [
+            key
+            for key, used in self._last_used.items()
+            if now - used > self.idle_timeout or (key[3] is not None and key[3].is_closed())
+        ]
+        return [self._pop(key) for key in expired]
+
+    def _close(self, key: _Key, client: Union[OpenAI, AsyncOpenAI]) -> None:
+        loop = key[3]
+        if loop is None:
+            client.close()
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._start_close(loop, client)
+            return
+        try:
+            loop.call_soon_threadsafe(self._start_close, loop, client)
+        except RuntimeError:
+            pass  # the loop is closed, and its connections with it
+
+    def _start_close(self, loop: asyncio.AbstractEventLoop, client: AsyncOpenAI) -> None:
+        task = loop.create_task(client.close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def aclose(self) -> None:
+        """
+        Closes every pooled client, e.g. on application shutdown; async
+        clients of other loops are closed on their loop.
+        """
+        with self._lock:
+            clients = list(self._clients.items())
+            self._clients.clear()
+            self._last_used.clear()
+        loop = asyncio.get_running_loop()
+        for key, client in clients:
+            if key[3] is loop:
+                await client.close()
+            else:
+                self._close(key, client)
+        if self._closing:
+            await asyncio.gather(*[task for task in self._closing if task.get_loop() is loop])
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "clients": len(self._clients),
+            "max_size": self.max_size,
+            "created": self.created,
+            "reused": self.reused,
+            "evictions": self.evictions,
+        }
+
+
+_default_pool: Optional[ClientPool] = None
+
+
+def default_client_pool() -> ClientPool:
+    """The process-wide pool every client in `aimakerspace` is taken from."""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = ClientPool()
+    return _default_pool
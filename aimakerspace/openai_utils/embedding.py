@@ -1,15 +1,109 @@
 from dotenv import load_dotenv
-from openai import AsyncOpenAI, OpenAI
 import openai
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import os
 import asyncio
+import random
+import time
+
+from aimakerspace.openai_utils.client_pool import default_client_pool
+from aimakerspace.openai_utils.embedding_backends import EmbeddingBackend, embedding_backend_from_env
+from aimakerspace.openai_utils.embedding_cache import EmbeddingCache, default_embedding_cache, query_embedding_lru
+
+
+# Errors worth retrying: throttling and transient server/network failures.
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Conservative token estimate (English BPE averages ~4 bytes per token)."""
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+def token_batches(list_of_text: List[str], max_batch_tokens: int, max_batch_size: int) -> List[Tuple[int, int]]:
+    """
+    Splits texts into consecutive (start, stop) ranges holding at most
+    `max_batch_size` texts and about `max_batch_tokens` tokens; a single
+    oversized text still gets a batch of its own.
+    """
+    batches = []
+    start, tokens = 0, 0
+    for i, text in enumerate(list_of_text):
+        cost = estimate_tokens(text)
+        if i > start and (tokens + cost > max_batch_tokens or i - start >= max_batch_size):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += cost
+    if start < len(list_of_text):
+        batches.append((start, len(list_of_text)))
+    return batches
 
 
 class EmbeddingModel:
-    def __init__(self, embeddings_model_name: str = "text-embedding-3-small"):
+    """
+    OpenAI embeddings. With a `cache` (by default the one configured by
+    `EMBEDDING_CACHE_PATH`, if any) only texts not embedded before with
+    this model are sent to the API.
+
+    Large inputs are split into requests of at most `max_batch_tokens`
+    (estimated) tokens and `max_batch_size` texts. The async methods send up
+    to `max_concurrency` (default `EMBEDDING_MAX_CONCURRENCY`, else 4) of them at once and reassemble the results in input
+    order. Rate-limit, timeout and 5xx errors are retried up to
+    `max_retries` times with jittered exponential backoff.
+
+    `dimensions` asks text-embedding-3 models for shortened vectors; to
+    keep full vectors for rescoring while scanning a short prefix, leave it
+    unset and use `storage.PrefixStorage` instead.
+
+    A `backend` (by default the one selected by `EMBEDDING_BACKEND`, see
+    `embedding_backends`) replaces the API calls with local embeddings,
+    e.g. for offline load tests; caching works the same either way.
+    """
+
+    def __init__(
+        self,
+        embeddings_model_name: str = "text-embedding-3-small",
+        cache: Optional[EmbeddingCache] = None,
+        max_batch_tokens: int = 50_000,
+        max_batch_size: int = 512,
+        max_concurrency: Optional[int] = None,
+        max_retries: int = 6,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        backend: Optional[EmbeddingBackend] = None,
+        dimensions: Optional[int] = None,
+    ):
         load_dotenv()
         self.embeddings_model_name = embeddings_model_name
+        self.cache = cache if cache is not None else default_embedding_cache()
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency or int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.backend = backend if backend is not None else embedding_backend_from_env()
+        self.dimensions = dimensions
+
+    @property
+    def model_key(self) -> str:
+        """Name cached embeddings are stored under."""
+        if self.backend is not None:
+            return self.backend.model_name
+        if self.dimensions is not None:
+            return f"{self.embeddings_model_name}@{self.dimensions}"
+        return self.embeddings_model_name
+
+    def _request_options(self) -> dict:
+        options = {"model": self.embeddings_model_name}
+        if self.dimensions is not None:
+            options["dimensions"] = self.dimensions
+        return options
 
     def _get_api_key(self, api_key: Optional[str] = None) -> str:
         key = api_key or os.getenv("OPENAI_API_KEY")
@@ -17,39 +111,122 @@ class EmbeddingModel:
             raise ValueError("OPENAI_API_KEY is not set. Pass it as an argument or set it in the environment.")
         return key
 
+    # Pooled clients, with their own retries off; `_backoff` owns the retry policy.
     def _get_async_client(self, api_key: Optional[str] = None):
-        return AsyncOpenAI(api_key=self._get_api_key(api_key))
+        return default_client_pool().async_client(self._get_api_key(api_key)).with_options(max_retries=0)
 
     def _get_client(self, api_key: Optional[str] = None):
-        return OpenAI(api_key=self._get_api_key(api_key))
+        return default_client_pool().client(self._get_api_key(api_key)).with_options(max_retries=0)
 
-    async def async_get_embeddings(self, list_of_text: List[str], api_key: Optional[str] = None) -> List[List[float]]:
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Seconds to wait before retry `attempt` (0-based): the server's Retry-After, else full jitter."""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), self.backoff_max)
+        except ValueError:
+            pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    async def _acreate(self, async_client, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await async_client.embeddings.create(input=texts, **self._request_options())
+                return [embedding.embedding for embedding in response.data]
+            except RETRYABLE_ERRORS as error:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt, error))
+
+    def _create(self, client, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = client.embeddings.create(input=texts, **self._request_options())
+                return [embedding.embedding for embedding in response.data]
+            except RETRYABLE_ERRORS as error:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt, error))
+
+    async def _aembed(self, texts: List[str], api_key: Optional[str] = None) -> List[List[float]]:
+        if self.backend is not None:
+            return await asyncio.to_thread(self.backend.embed, texts)
         async_client = self._get_async_client(api_key)
-        embedding_response = await async_client.embeddings.create(
-            input=list_of_text, model=self.embeddings_model_name
-        )
-        return [embeddings.embedding for embeddings in embedding_response.data]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def embed_batch(start: int, stop: int) -> List[List[float]]:
+            async with semaphore:
+                return await self._acreate(async_client, texts[start:stop])
+
+        batches = token_batches(texts, self.max_batch_tokens, self.max_batch_size)
+        # gather preserves argument order, so batches reassemble in input order.
+        results = await asyncio.gather(*(embed_batch(start, stop) for start, stop in batches))
+        return [embedding for batch in results for embedding in batch]
+
+    def _embed(self, texts: List[str], api_key: Optional[str] = None) -> List[List[float]]:
+        if self.backend is not None:
+            return self.backend.embed(texts)
+        client = self._get_client(api_key)
+        embeddings = []
+        for start, stop in token_batches(texts, self.max_batch_tokens, self.max_batch_size):
+            embeddings.extend(self._create(client, texts[start:stop]))
+        return embeddings
+
+    def _lookup(self, list_of_text: List[str]) -> Tuple[List[Optional[List[float]]], List[str]]:
+        """Cached embeddings (None for misses) and the distinct texts still to embed."""
+        if self.cache is None:
+            return [None] * len(list_of_text), list(dict.fromkeys(list_of_text))
+        cached = [
+            None if vector is None else vector.tolist()
+            for vector in self.cache.get_many(self.model_key, list_of_text)
+        ]
+        missing = [text for text, vector in zip(list_of_text, cached) if vector is None]
+        return cached, list(dict.fromkeys(missing))
+
+    def _merge(
+        self,
+        list_of_text: List[str],
+        cached: List[Optional[List[float]]],
+        missing: List[str],
+        embeddings: List[List[float]],
+    ) -> List[List[float]]:
+        if self.cache is not None:
+            self.cache.put_many(self.model_key, missing, embeddings)
+        fetched = dict(zip(missing, embeddings))
+        return [fetched[text] if vector is None else vector for text, vector in zip(list_of_text, cached)]
+
+    async def async_get_embeddings(self, list_of_text: List[str], api_key: Optional[str] = None) -> List[List[float]]:
+        # Cache reads and writes are SQLite calls; keep them off the event loop
+        cached, missing = await asyncio.to_thread(self._lookup, list_of_text)
+        embeddings = await self._aembed(missing, api_key) if missing else []
+        return await asyncio.to_thread(self._merge, list_of_text, cached, missing, embeddings)
 
     async def async_get_embedding(self, text: str, api_key: Optional[str] = None) -> List[float]:
-        async_client = self._get_async_client(api_key)
-        embedding = await async_client.embeddings.create(
-            input=text, model=self.embeddings_model_name
-        )
-        return embedding.data[0].embedding
+        return (await self.async_get_embeddings([text], api_key=api_key))[0]
 
     def get_embeddings(self, list_of_text: List[str], api_key: Optional[str] = None) -> List[List[float]]:
-        client = self._get_client(api_key)
-        embedding_response = client.embeddings.create(
-            input=list_of_text, model=self.embeddings_model_name
-        )
-        return [embeddings.embedding for embeddings in embedding_response.data]
+        cached, missing = self._lookup(list_of_text)
+        embeddings = self._embed(missing, api_key) if missing else []
+        return self._merge(list_of_text, cached, missing, embeddings)
 
     def get_embedding(self, text: str, api_key: Optional[str] = None) -> List[float]:
-        client = self._get_client(api_key)
-        embedding = client.embeddings.create(
-            input=text, model=self.embeddings_model_name
-        )
-        return embedding.data[0].embedding
+        return self.get_embeddings([text], api_key=api_key)[0]
+
+    async def async_get_query_embedding(self, text: str, api_key: Optional[str] = None) -> List[float]:
+        """Like `async_get_embedding`, served from the in-memory query LRU when possible."""
+        embedding = query_embedding_lru().get(self.model_key, text)
+        if embedding is None:
+            embedding = await self.async_get_embedding(text, api_key=api_key)
+            query_embedding_lru().put(self.model_key, text, embedding)
+        return embedding
+
+    def get_query_embedding(self, text: str, api_key: Optional[str] = None) -> List[float]:
+        embedding = query_embedding_lru().get(self.model_key, text)
+        if embedding is None:
+            embedding = self.get_embedding(text, api_key=api_key)
+            query_embedding_lru().put(self.model_key, text, embedding)
+        return embedding
 
 
 if __name__ == "__main__":
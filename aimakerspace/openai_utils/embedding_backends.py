@@ -0,0 +1,88 @@
+import os
+import re
+import zlib
+from typing import Dict, List, Optional, Type
+
+import numpy as np
+
+
+_TOKEN = re.compile(r"\w+")
+
+
+class EmbeddingBackend:
+    """
+    Computes embeddings locally in place of the OpenAI API. `model_name`
+    namespaces cached vectors, so backends never share cache entries.
+    """
+
+    name = "base"
+
+    @property
+    def model_name(self) -> str:
+        return self.name
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Deterministic, offline stand-in for an embedding API.
+
+    Each word and word bigram is hashed (CRC32, salted with `seed`) to one
+    of `dim` coordinates with a hashed sign, weighted by 1 + log(count), and
+    the result is L2-normalized. Texts sharing vocabulary get similar
+    vectors, so retrieval behaves plausibly, and the same text always maps
+    to the same vector across processes and machines. No network, no key.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 1536, seed: int = 0):
+        self.dim = dim
+        self.seed = seed
+        self._salt = seed.to_bytes(8, "little", signed=True)
+
+    @property
+    def model_name(self) -> str:
+        return f"{self.name}-{self.dim}-{self.seed}"
+
+    def _features(self, text: str) -> List[str]:
+        words = _TOKEN.findall(text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            features, counts = np.unique(self._features(text), return_counts=True)
+            if not len(features):
+                continue
+            hashes = np.fromiter(
+                (zlib.crc32(self._salt + feature.encode("utf-8")) for feature in features),
+                dtype=np.uint64,
+                count=len(features),
+            )
+            signs = np.where(hashes >> np.uint64(31) & np.uint64(1), -1.0, 1.0)
+            np.add.at(vectors[i], (hashes % np.uint64(self.dim)).astype(np.int64), signs * (1 + np.log(counts)))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.where(norms == 0, 1, norms)).tolist()
+
+
+EMBEDDING_BACKENDS: Dict[str, Optional[Type[EmbeddingBackend]]] = {
+    "openai": None,  # built into EmbeddingModel
+    HashingEmbeddingBackend.name: HashingEmbeddingBackend,
+}
+
+
+def embedding_backend_from_env() -> Optional[EmbeddingBackend]:
+    """
+    The backend named by `EMBEDDING_BACKEND` ("openai", the default, or
+    "hashing"), sized by `EMBEDDING_DIM` (default 1536); None means OpenAI.
+    """
+    name = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {name}. Available: {sorted(EMBEDDING_BACKENDS)}")
+    backend_class = EMBEDDING_BACKENDS[name]
+    if backend_class is None:
+        return None
+    return backend_class(dim=int(os.getenv("EMBEDDING_DIM", "1536")))
@@ -0,0 +1,242 @@
+import hashlib
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Disk-backed embedding cache keyed by (model name, SHA-256 of the text).
+
+    Vectors live in a single SQLite table as raw float32 blobs, so identical
+    text is embedded once per model no matter which upload it came from.
+    Lookups and inserts are batched into a few statements per call. Every
+    hit refreshes the entry's last-use stamp; once the stored vectors exceed
+    `max_bytes` the least recently used entries are deleted.
+    """
+
+    _max_variables = 500  # stays under SQLITE_MAX_VARIABLE_NUMBER on old builds
+
+    def __init__(self, path: str, max_bytes: int = 1 << 30):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # Recency lives in its own narrow table so refreshing it on a hit
+        # does not rewrite the (multi-kilobyte) vector rows.
+        self._connection.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS embeddings (
+                id INTEGER PRIMARY KEY,
+                model TEXT NOT NULL,
+                hash BLOB NOT NULL,
+                vector BLOB NOT NULL,
+                UNIQUE (model, hash)
+            );
+            CREATE TABLE IF NOT EXISTS usage (
+                id INTEGER PRIMARY KEY,
+                last_used INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS usage_last_used ON usage (last_used);
+            """
+        )
+        self._lock = threading.Lock()
+        self._clock = itertools.count(time.time_ns())
+        (stored,) = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM usage").fetchone()
+        self.stored_bytes = stored
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _hash(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def _batches(self, items: Sequence) -> List[Sequence]:
+        return [items[start : start + self._max_variables] for start in range(0, len(items), self._max_variables)]
+
+    def _touch(self, ids: List[int]) -> None:
+        stamp = next(self._clock)
+        for batch in self._batches(ids):
+            placeholders = ",".join("?" * len(batch))
+            self._connection.execute(f"UPDATE usage SET last_used = ? WHERE id IN ({placeholders})", [stamp, *batch])
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Cached vectors in input order, None for misses."""
+        hashes = [self._hash(text) for text in texts]
+        found: Dict[bytes, np.ndarray] = {}
+        ids = []
+        with self._lock:
+            for batch in self._batches(list(set(hashes))):
+                placeholders = ",".join("?" * len(batch))
+                for id_, hash_, vector in self._connection.execute(
+                    f"SELECT id, hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [model, *batch],
+                ):
+                    ids.append(id_)
+                    found[hash_] = np.frombuffer(vector, dtype=np.float32)
+            if ids:
+                self._touch(ids)
+                self._connection.commit()
+            results = [found.get(hash_) for hash_ in hashes]
+            hits = sum(result is not None for result in results)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Stores vectors for texts not cached yet; existing entries are only marked as used."""
+        if not texts:
+            return
+        entries = {
+            self._hash(text): np.asarray(vector, dtype=np.float32).tobytes() for text, vector in zip(texts, vectors)
+        }
+        stamp = next(self._clock)
+        with self._lock:
+            for batch in self._batches(list(entries)):
+                placeholders = ",".join("?" * len(batch))
+                existing = dict(
+                    self._connection.execute(
+                        f"SELECT hash, id FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                        [model, *batch],
+                    ).fetchall()
+                )
+                self._touch(list(existing.values()))
+                for hash_ in batch:
+                    if hash_ in existing:
+                        continue
+                    vector = entries[hash_]
+                    cursor = self._connection.execute(
+                        "INSERT INTO embeddings (model, hash, vector) VALUES (?, ?, ?)", (model, hash_, vector)
+                    )
+                    self._connection.execute(
+                        "INSERT INTO usage (id, last_used, size) VALUES (?, ?, ?)",
+                        (cursor.lastrowid, stamp, len(vector)),
+                    )
+                    self.stored_bytes += len(vector)
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        if self.stored_bytes <= self.max_bytes:
+            return
+        excess = self.stored_bytes - self.max_bytes
+        victims = []
+        for id_, size in self._connection.execute("SELECT id, size FROM usage ORDER BY last_used"):
+            victims.append((id_,))
+            excess -= size
+            self.stored_bytes -= size
+            if excess <= 0:
+                break
+        self._connection.executemany("DELETE FROM embeddings WHERE id = ?", victims)
+        self._connection.executemany("DELETE FROM usage WHERE id = ?", victims)
+        self.evictions += len(victims)
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return count
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM embeddings")
+            self._connection.execute("DELETE FROM usage")
+            self._connection.commit()
+            self.stored_bytes = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "stored_bytes": self.stored_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class QueryEmbeddingLRU:
+    """
+    Small in-memory LRU of query embeddings keyed by (model, text), so a
+    repeated question skips the embedding round trip (and the disk cache).
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        with self._lock:
+            embedding = self._entries.get((model, text))
+            if embedding is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end((model, text))
+            return embedding
+
+    def put(self, model: str, text: str, embedding: List[float]) -> None:
+        with self._lock:
+            self._entries[(model, text)] = embedding
+            self._entries.move_to_end((model, text))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_default_cache: Optional[EmbeddingCache] = None
+_query_lru: Optional[QueryEmbeddingLRU] = None
+
+
+def default_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    The process-wide cache configured by `EMBEDDING_CACHE_PATH` (and
+    `EMBEDDING_CACHE_MAX_MB`, default 1024), or None when unset.
+    """
+    global _default_cache
+    path = os.getenv("EMBEDDING_CACHE_PATH")
+    if not path:
+        return None
+    if _default_cache is None or _default_cache.path != path:
+        max_bytes = int(float(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+        _default_cache = EmbeddingCache(path, max_bytes=max_bytes)
+    return _default_cache
+
+
+def query_embedding_lru() -> QueryEmbeddingLRU:
+    """The process-wide query LRU, sized by `QUERY_EMBEDDING_CACHE_SIZE` (default 1024)."""
+    global _query_lru
+    if _query_lru is None:
+        _query_lru = QueryEmbeddingLRU(int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024")))
+    return _query_lru
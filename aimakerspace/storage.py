@@ -0,0 +1,488 @@
+import numpy as np
+from typing import Dict, Optional, Type
+import os
+
+
+def load_array(path: str, dtype, shape, mmap: bool) -> np.ndarray:
+    """Reads a raw array file, or maps it copy-on-write with `mmap=True`."""
+    if mmap and 0 not in shape:  # np.memmap cannot map an empty file
+        return np.memmap(path, dtype=dtype, mode="c", shape=shape)
+    return np.fromfile(path, dtype=dtype).reshape(shape)
+
+
+class Float32Storage:
+    """
+    Growable row storage for L2-normalized vectors and their original norms.
+
+    Subclasses change how rows are encoded; everything that reads vectors
+    (indexes, snapshots, metrics) goes through `score` and `vectors`, so an
+    index works unchanged on top of any storage.
+    """
+
+    name = "float32"
+    code_dtype = np.float32
+    _initial_capacity = 64
+
+    def __init__(self):
+        self.dim: Optional[int] = None
+        self.rescore_factor = 0
+        self._codes = np.empty((0, 0), dtype=self.code_dtype)
+        self._norms = np.empty(0, dtype=np.float32)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def norms(self) -> np.ndarray:
+        return self._norms[: self._size]
+
+    @property
+    def nbytes_per_vector(self) -> int:
+        return self._code_size(self.dim or 0) * np.dtype(self.code_dtype).itemsize
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of live encoded rows and norms."""
+        return self._size * (self.nbytes_per_vector + self._norms.itemsize)
+
+    @property
+    def is_trained(self) -> bool:
+        return True
+
+    def train(self, vectors: np.ndarray) -> None:
+        pass
+
+    def _code_size(self, dim: int) -> int:
+        return dim
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        return vectors
+
+    def _decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes
+
+    def _grow(self, array: np.ndarray, capacity: int) -> np.ndarray:
+        grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+        grown[: self._size] = array[: self._size]
+        return grown
+
+    def _reserve(self, capacity: int) -> None:
+        if capacity <= len(self._codes):
+            return
+        capacity = max(capacity, 2 * len(self._codes), self._initial_capacity)
+        self._codes = self._grow(self._codes, capacity)
+        self._norms = self._grow(self._norms, capacity)
+
+    def append(self, vectors: np.ndarray, norms: np.ndarray) -> np.ndarray:
+        """Appends normalized rows and returns their row numbers."""
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self._codes = np.empty((0, self._code_size(self.dim)), dtype=self.code_dtype)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(
+                f"Vector dimension {vectors.shape[1]} does not match database dimension {self.dim}"
+            )
+        rows = np.arange(self._size, self._size + len(vectors))
+        self._reserve(self._size + len(vectors))
+        self._size += len(vectors)
+        self.update(rows, vectors, norms)
+        return rows
+
+    def update(self, rows: np.ndarray, vectors: np.ndarray, norms: np.ndarray) -> None:
+        self._codes[rows] = self._encode(vectors)
+        self._norms[rows] = norms
+
+    def compact(self, rows: np.ndarray) -> None:
+        """Keeps only `rows`, in that order, in freshly allocated arrays."""
+        self._codes = self._codes[rows]
+        self._norms = self._norms[rows]
+        self._size = len(rows)
+
+    def vectors(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Decoded normalized rows; a zero-copy view for float32 storage."""
+        codes = self._codes[: self._size] if rows is None else self._codes[rows]
+        return self._decode(codes)
+
+    def score(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Inner products of normalized queries (q, dim) with rows, shape (q, n);
+        `rows` may be an index array or a slice (a zero-copy view).
+        """
+        return queries @ self.vectors(rows).T
+
+    def rescore(self, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Exact scores for a (q, n) array of candidate rows."""
+        return np.einsum("qd,qnd->qn", queries, self.vectors(rows))
+
+    def clear(self) -> None:
+        self.__init__(**self._init_kwargs())
+
+    def _init_kwargs(self) -> Dict:
+        """Constructor arguments that recreate this storage's settings (kept by snapshots)."""
+        return {}
+
+    def save(self, path: str) -> None:
+        self._codes[: self._size].tofile(os.path.join(path, "vectors.f32"))
+        self.norms.tofile(os.path.join(path, "norms.f32"))
+
+    def load(self, path: str, count: int, dim: int, mmap: bool) -> None:
+        """Fills an empty storage from a snapshot written by `save`."""
+        self.dim = dim
+        self._size = count
+        self._codes = load_array(
+            os.path.join(path, "vectors.f32"), self.code_dtype, (count, dim), mmap
+        )
+        self._norms = load_array(os.path.join(path, "norms.f32"), np.float32, (count,), mmap)
+
+
+class _QuantizedStorage(Float32Storage):
+    """
+    Shared plumbing for lossy storages.
+
+    Training is deferred: until `min_train_size` rows have been appended
+    they are held (and scored) as float32, then the quantizer is trained on
+    all of them at once and they are encoded, so a collection built one
+    small batch at a time gets the same quantizer as one built in bulk.
+    With `rescore_factor > 0` the float32 rows are kept as well, searches
+    fetch `k * rescore_factor` candidates using the compressed codes and
+    re-rank them exactly; after `load(..., mmap=True)` those originals stay
+    on disk.
+    """
+
+    def __init__(self, rescore_factor: int = 0, min_train_size: int = 1024):
+        super().__init__()
+        self.rescore_factor = rescore_factor
+        self.min_train_size = min_train_size
+        self._originals = np.empty((0, 0), dtype=np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes of live codes and norms, plus the float32 originals unless
+        they are memory-mapped from a snapshot (then only the candidate
+        rows that rescoring touches are paged in).
+        """
+        size = super().nbytes
+        if self._keeps_originals and not isinstance(self._originals, np.memmap):
+            size += self._size * self.dim * self._originals.itemsize
+        return size
+
+    @property
+    def _keeps_originals(self) -> bool:
+        return bool(self.rescore_factor) or not self.is_trained
+
+    def _reserve(self, capacity: int) -> None:
+        super()._reserve(capacity)
+        if self._keeps_originals and capacity > len(self._originals):
+            if self._originals.shape[1:] != (self.dim,):
+                self._originals = np.empty((0, self.dim), dtype=np.float32)
+            self._originals = self._grow(self._originals, len(self._codes))
+
+    def append(self, vectors: np.ndarray, norms: np.ndarray) -> np.ndarray:
+        rows = super().append(vectors, norms)
+        if not self.is_trained and self._size >= self.min_train_size:
+            self._train_pending()
+        return rows
+
+    def _train_pending(self) -> None:
+        """Trains on every row held as float32 so far and encodes them."""
+        vectors = self._originals[: self._size]
+        self.train(vectors)
+        self._codes[: self._size] = self._encode(vectors)
+        if not self.rescore_factor:
+            self._originals = np.empty((0, self.dim), dtype=np.float32)
+
+    def update(self, rows: np.ndarray, vectors: np.ndarray, norms: np.ndarray) -> None:
+        if self.is_trained:
+            super().update(rows, vectors, norms)
+        else:
+            self._norms[rows] = norms
+        if self._keeps_originals:
+            self._originals[rows] = vectors
+
+    def compact(self, rows: np.ndarray) -> None:
+        if self._keeps_originals:
+            self._originals = self._originals[rows]
+        super().compact(rows)
+
+    def vectors(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        if not self.is_trained:
+            return self._originals[: self._size] if rows is None else self._originals[rows]
+        return super().vectors(rows)
+
+    def score(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        if not self.is_trained:
+            return super().score(queries, rows)
+        return self._score_codes(queries, rows)
+
+    def _score_codes(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        raise NotImplementedError
+
+    def rescore(self, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        return np.einsum("qd,qnd->qn", queries, self._originals[rows])
+
+    def _init_kwargs(self) -> Dict:
+        return {"rescore_factor": self.rescore_factor, "min_train_size": self.min_train_size}
+
+    def _params(self) -> Dict[str, np.ndarray]:
+        raise NotImplementedError
+
+    def _set_params(self, params: Dict[str, np.ndarray]) -> None:
+        raise NotImplementedError
+
+    def save(self, path: str) -> None:
+        # An untrained storage writes an empty quantizer.npz and only the float32 rows.
+        if self.is_trained:
+            self._codes[: self._size].tofile(os.path.join(path, f"codes.{self.name}"))
+        self.norms.tofile(os.path.join(path, "norms.f32"))
+        np.savez(os.path.join(path, "quantizer.npz"), **(self._params() if self.is_trained else {}))
+        if self._keeps_originals:
+            self._originals[: self._size].tofile(os.path.join(path, "vectors.f32"))
+
+    def load(self, path: str, count: int, dim: int, mmap: bool) -> None:
+        self.dim = dim
+        self._size = count
+        with np.load(os.path.join(path, "quantizer.npz")) as params:
+            if params.files:
+                self._set_params(dict(params))
+        if self.is_trained:
+            self._codes = load_array(
+                os.path.join(path, f"codes.{self.name}"), self.code_dtype, (count, self._code_size(dim)), mmap
+            )
+        else:
+            self._codes = np.empty((count, self._code_size(dim)), dtype=self.code_dtype)
+        self._norms = load_array(os.path.join(path, "norms.f32"), np.float32, (count,), mmap)
+        originals_path = os.path.join(path, "vectors.f32")
+        if self._keeps_originals and os.path.exists(originals_path):
+            self._originals = load_array(originals_path, np.float32, (count, dim), mmap)
+        else:
+            self.rescore_factor = 0
+
+
+class Int8Storage(_QuantizedStorage):
+    """
+    Per-dimension scalar quantization to int8 (4x smaller than float32).
+
+    Each dimension is mapped linearly from its [min, max] over the training
+    rows onto [-127, 127]; later rows outside that range are clipped.
+    Scoring is asymmetric: queries stay float32 and are folded into the
+    per-dimension scales, so rows are never decoded in bulk.
+    """
+
+    name = "int8"
+    code_dtype = np.int8
+
+    def __init__(self, rescore_factor: int = 0, min_train_size: int = 1024, block_size: int = 16384):
+        super().__init__(rescore_factor, min_train_size)
+        self.block_size = block_size
+        self.scale: Optional[np.ndarray] = None
+        self.center: Optional[np.ndarray] = None
+
+    def _init_kwargs(self) -> Dict:
+        return {
+            "rescore_factor": self.rescore_factor,
+            "min_train_size": self.min_train_size,
+            "block_size": self.block_size,
+        }
+
+    @property
+    def is_trained(self) -> bool:
+        return self.scale is not None
+
+    def train(self, vectors: np.ndarray) -> None:
+        low, high = vectors.min(axis=0), vectors.max(axis=0)
+        self.center = ((high + low) / 2).astype(np.float32)
+        self.scale = np.maximum((high - low) / 254, 1e-12).astype(np.float32)
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint((vectors - self.center) / self.scale), -127, 127).astype(np.int8)
+
+    def _decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * self.scale + self.center
+
+    def _score_codes(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        codes = self._codes[: self._size] if rows is None else self._codes[rows]
+        scaled = (queries * self.scale).T
+        offsets = queries @ self.center
+        scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), self.block_size):
+            block = codes[start : start + self.block_size].astype(np.float32)
+            scores[:, start : start + self.block_size] = (block @ scaled).T
+        return scores + offsets[:, None]
+
+    def _params(self) -> Dict[str, np.ndarray]:
+        return {"scale": self.scale, "center": self.center}
+
+    def _set_params(self, params: Dict[str, np.ndarray]) -> None:
+        self.scale, self.center = params["scale"], params["center"]
+
+
+class PQStorage(_QuantizedStorage):
+    """
+    Product quantization: `m` sub-vectors, each replaced by the id of its
+    nearest of 256 k-means centroids (one byte per sub-vector).
+
+    Queries are scored with asymmetric distance computation: a (m, 256)
+    table of query/centroid inner products is built once per query and each
+    row's score is the sum of `m` table lookups.
+    """
+
+    name = "pq"
+    code_dtype = np.uint8
+
+    def __init__(
+        self,
+        m: Optional[int] = None,
+        rescore_factor: int = 0,
+        min_train_size: int = 1024,
+        n_iter: int = 15,
+        max_train_size: int = 16384,
+        block_size: int = 16384,
+        seed: int = 0,
+    ):
+        super().__init__(rescore_factor, min_train_size)
+        self.m = m
+        self.n_iter = n_iter
+        self.max_train_size = max_train_size
+        self.block_size = block_size
+        self.seed = seed
+        self.codebooks: Optional[np.ndarray] = None  # (m, ksub, dim // m)
+
+    def _init_kwargs(self) -> Dict:
+        return {
+            "m": self.m,
+            "rescore_factor": self.rescore_factor,
+            "min_train_size": self.min_train_size,
+            "n_iter": self.n_iter,
+            "max_train_size": self.max_train_size,
+            "block_size": self.block_size,
+            "seed": self.seed,
+        }
+
+    @property
+    def is_trained(self) -> bool:
+        return self.codebooks is not None
+
+    def _code_size(self, dim: int) -> int:
+        if self.m is None:
+            # Eight dimensions per byte (192 bytes for 1536-d), or the largest divisor below that.
+            self.m = next(m for m in range(max(1, dim // 8), dim + 1) if dim % m == 0)
+        if dim % self.m:
+            raise ValueError(f"PQStorage m={self.m} must divide the vector dimension {dim}")
+        return self.m
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        return vectors.reshape(len(vectors), self.m, -1)
+
+    def train(self, vectors: np.ndarray) -> None:
+        rng = np.random.default_rng(self.seed)
+        if len(vectors) > self.max_train_size:
+            vectors = vectors[rng.choice(len(vectors), self.max_train_size, replace=False)]
+        subvectors = self._split(vectors).transpose(1, 0, 2)  # (m, n, dsub)
+        ksub = min(256, len(vectors))
+        codebooks = []
+        for points in subvectors:
+            centroids = points[rng.choice(len(points), ksub, replace=False)].copy()
+            for _ in range(self.n_iter):
+                labels = self._nearest(points, centroids)
+                counts = np.bincount(labels, minlength=ksub)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, points)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+            codebooks.append(centroids)
+        self.codebooks = np.stack(codebooks).astype(np.float32)
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        distances = (centroids ** 2).sum(axis=1) - 2 * points @ centroids.T
+        return np.argmin(distances, axis=1)
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        subvectors = self._split(vectors)
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = self._nearest(subvectors[:, j], self.codebooks[j])
+        return codes
+
+    def _decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = self.codebooks[np.arange(self.m), codes]  # (n, m, dsub)
+        return parts.reshape(len(codes), -1)
+
+    def _score_codes(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        codes = self._codes[: self._size] if rows is None else self._codes[rows]
+        tables = np.einsum("qmd,mkd->qmk", self._split(queries), self.codebooks)
+        scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+        subspaces = np.arange(self.m)
+        for start in range(0, len(codes), self.block_size):
+            block = codes[start : start + self.block_size]
+            for i, table in enumerate(tables):
+                scores[i, start : start + len(block)] = table[subspaces, block].sum(axis=1)
+        return scores
+
+    def _params(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks}
+
+    def _set_params(self, params: Dict[str, np.ndarray]) -> None:
+        self.codebooks = params["codebooks"]
+        self.m = len(self.codebooks)
+
+
+class PrefixStorage(_QuantizedStorage):
+    """
+    Keeps only the first `prefix_dim` dimensions of each row, renormalized.
+
+    Embeddings trained Matryoshka-style (OpenAI's text-embedding-3 models)
+    front-load their information, so the prefix alone ranks rows almost
+    like the full vector at a fraction of the bytes and FLOPs. With
+    `rescore_factor` (default 4) the full rows are kept too and the top
+    `k * rescore_factor` prefix candidates are re-ranked at full dimension.
+    """
+
+    name = "prefix"
+    code_dtype = np.float32
+
+    def __init__(self, prefix_dim: int = 512, rescore_factor: int = 4):
+        super().__init__(rescore_factor)
+        self.prefix_dim = prefix_dim
+
+    def _init_kwargs(self) -> Dict:
+        return {"prefix_dim": self.prefix_dim, "rescore_factor": self.rescore_factor}
+
+    def _code_size(self, dim: int) -> int:
+        return min(self.prefix_dim, dim)
+
+    def _truncate(self, vectors: np.ndarray) -> np.ndarray:
+        prefix = vectors[:, : self.prefix_dim]
+        norms = np.linalg.norm(prefix, axis=1, keepdims=True)
+        return (prefix / np.where(norms == 0, 1, norms)).astype(np.float32, copy=False)
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        return self._truncate(vectors)
+
+    def _decode(self, codes: np.ndarray) -> np.ndarray:
+        # Only an approximation (the prefix, zero-padded); `vectors` prefers the full rows.
+        decoded = np.zeros((len(codes), self.dim), dtype=np.float32)
+        decoded[:, : codes.shape[1]] = codes
+        return decoded
+
+    def vectors(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        if self.rescore_factor:
+            return self._originals[: self._size] if rows is None else self._originals[rows]
+        return super().vectors(rows)
+
+    def score(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        codes = self._codes[: self._size] if rows is None else self._codes[rows]
+        return self._truncate(queries) @ codes.T
+
+    def _params(self) -> Dict[str, np.ndarray]:
+        return {"prefix_dim": np.array(self.prefix_dim)}
+
+    def _set_params(self, params: Dict[str, np.ndarray]) -> None:
+        self.prefix_dim = int(params["prefix_dim"])
+
+
+STORAGES: Dict[str, Type[Float32Storage]] = {
+    storage.name: storage for storage in (Float32Storage, Int8Storage, PQStorage, PrefixStorage)
+}
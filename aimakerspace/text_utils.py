@@ -1,6 +1,183 @@
 import os
-from typing import List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import IO, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+import bisect
+import csv
+import functools
+import io
+import multiprocessing
 import re
+import time
+
+import numpy as np
+
+from aimakerspace.tokenization import count_tokens, token_offsets
+
+
+# (path, text, error): text is None and error describes the failure when a file could not be read
+LoadedFile = Tuple[str, Optional[str], Optional[str]]
+
+
+def _read_text_file(path: str, encoding: str = "utf-8") -> str:
+    with open(path, "r", encoding=encoding) as f:
+        return f.read()
+
+
+def _read_pdf_file(path: str) -> str:
+    from PyPDF2 import PdfReader
+
+    with open(path, 'rb') as file:
+        pdf_reader = PdfReader(file)
+        # Extract text from each page
+        return "".join(page.extract_text() + "\n" for page in pdf_reader.pages)
+
+
+def _load_file(read: Callable[[str], str], path: str) -> LoadedFile:
+    try:
+        return path, read(path), None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def _ordered_map(executor, fn: Callable, items: Iterable, max_in_flight: int) -> Iterator:
+    """`executor.map(fn, items)` with at most `max_in_flight` items submitted ahead of the consumer."""
+    try:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # Also runs when the consumer stops early: drop queued work
+        executor.shutdown(cancel_futures=True)
+
+
+def iter_load_files(
+    paths: Iterable[str],
+    read: Callable[[str], str],
+    max_workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[LoadedFile]:
+    """
+    Reads `paths` with `read` in a process pool and yields `(path, text,
+    error)` in input order, lazily: at most `max_in_flight` files (default
+    twice `max_workers`, itself defaulting to the CPU count) are parsed or
+    held at once, so memory is bounded by the window, not the directory.
+    A file that fails to read yields its error instead of aborting the run.
+    `read` must be picklable (a module-level function or a partial of one).
+    With one worker, files are read in this process.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    load = functools.partial(_load_file, read)
+    if max_workers == 1:
+        return map(load, paths)
+    max_in_flight = max(max_in_flight or 2 * max_workers, 1)
+    return _ordered_map(ProcessPoolExecutor(max_workers), load, paths, max_in_flight)
+
+
+def _extract_page(pages, index: int) -> Tuple[int, str, float]:
+    started = time.perf_counter()
+    text = pages[index].extract_text() or ""
+    return index + 1, text, time.perf_counter() - started
+
+
+def _extract_pdf_range(data: bytes, start: int, stop: int) -> List[Tuple[int, str, float]]:
+    """Pages `start` to `stop - 1` of the PDF in `data`, parsed once for the whole range."""
+    from PyPDF2 import PdfReader
+
+    pages = PdfReader(io.BytesIO(data)).pages
+    return [_extract_page(pages, index) for index in range(start, stop)]
+
+
+def pdf_executor(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    A process pool for `iter_pdf_pages(executor=...)`, meant to be created
+    once and shared (e.g. for the lifetime of a server). Workers start via
+    forkserver, or spawn where that is unavailable, never by forking the
+    calling (possibly multi-threaded) process.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    return ProcessPoolExecutor(max_workers or os.cpu_count() or 1, mp_context=context)
+
+
+def _pooled_pdf_pages(
+    executor: ProcessPoolExecutor,
+    data: bytes,
+    pages,
+    ranges: List[Tuple[int, int]],
+    max_in_flight: int,
+    owned: bool,
+) -> Iterator[Tuple[int, str, float]]:
+    next_index = 0
+    pending = deque()
+    try:
+        try:
+            for start, stop in ranges:
+                pending.append(executor.submit(_extract_pdf_range, data, start, stop))
+                if len(pending) >= max_in_flight:
+                    for page in pending.popleft().result():
+                        next_index = page[0]
+                        yield page
+            while pending:
+                for page in pending.popleft().result():
+                    next_index = page[0]
+                    yield page
+        except (BrokenProcessPool, RuntimeError, OSError):
+            # The pool could not start, died or was shut down: finish in this
+            # process (an error raised by the page itself is raised again here)
+            for index in range(next_index, len(pages)):
+                yield _extract_page(pages, index)
+    finally:
+        # Also runs when the consumer stops early: drop queued work
+        for future in pending:
+            future.cancel()
+        if owned:
+            executor.shutdown(cancel_futures=True)
+
+
+def iter_pdf_pages(
+    data: bytes,
+    max_workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    executor: Optional[ProcessPoolExecutor] = None,
+    min_pool_pages: int = 8,
+) -> Iterator[Tuple[int, str, float]]:
+    """
+    Extracts the text of every page of the PDF in `data` and yields
+    `(page_number, text, seconds)` in page order (numbers start at 1).
+    `seconds` is the extraction time of that page alone, so pathological
+    pages stand out. Unreadable documents raise before any work is started.
+
+    Pages are extracted in contiguous ranges, each parsed once by a worker
+    of `executor` (a shared `pdf_executor`), or of a pool of `max_workers`
+    processes (default: one per CPU) started for this call; at most
+    `max_in_flight` ranges are queued at once. Documents shorter than
+    `min_pool_pages`, a single worker, and a pool that fails are handled
+    in this process instead.
+    """
+    from PyPDF2 import PdfReader
+
+    pages = PdfReader(io.BytesIO(data)).pages
+    page_count = len(pages)
+    max_workers = min(max_workers or os.cpu_count() or 1, max(page_count, 1))
+    if max_workers == 1 or page_count < min_pool_pages:
+        return (_extract_page(pages, index) for index in range(page_count))
+    # Two ranges per worker keeps every worker busy while pages stream back in order
+    size = -(-page_count // (2 * max_workers))
+    ranges = [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+    max_in_flight = max(max_in_flight or max_workers + 1, 1)
+    owned = executor is None
+    try:
+        if owned:
+            executor = pdf_executor(max_workers)
+    except (OSError, ValueError):
+        return (_extract_page(pages, index) for index in range(page_count))
+    return _pooled_pdf_pages(executor, data, pages, ranges, max_in_flight, owned)
 
 
 class TextFileLoader:
@@ -20,17 +197,35 @@ class TextFileLoader:
             )
 
     def load_file(self):
-        with open(self.path, "r", encoding=self.encoding) as f:
-            self.documents.append(f.read())
+        self.documents.append(_read_text_file(self.path, self.encoding))
 
     def load_directory(self):
-        for root, _, files in os.walk(self.path):
-            for file in files:
-                if file.endswith(".txt"):
-                    with open(
-                        os.path.join(root, file), "r", encoding=self.encoding
-                    ) as f:
-                        self.documents.append(f.read())
+        for path, text, error in self.iter_documents():
+            if error is not None:
+                raise ValueError(f"Error processing file at '{path}': {error}")
+            self.documents.append(text)
+
+    def iter_documents(
+        self, max_workers: Optional[int] = 1, max_in_flight: Optional[int] = None
+    ) -> Iterator[LoadedFile]:
+        """
+        Lazily yields `(path, text, error)` for every .txt file under the
+        directory (or for the file itself); see `iter_load_files`. Nothing
+        is added to `self.documents`. Decoding text is cheaper than sending
+        it back from a worker process, so files are read in this process
+        unless `max_workers` asks for a pool (None: one per CPU).
+        """
+        if os.path.isdir(self.path):
+            paths = (
+                os.path.join(root, file)
+                for root, _, files in os.walk(self.path)
+                for file in files
+                if file.endswith(".txt")
+            )
+        else:
+            paths = [self.path]
+        read = functools.partial(_read_text_file, encoding=self.encoding)
+        return iter_load_files(paths, read, max_workers, max_in_flight)
 
     def load_documents(self):
         self.load()
@@ -63,6 +258,85 @@ class CharacterTextSplitter:
         return chunks
 
 
+class TokenTextSplitter:
+    """
+    Splits text into chunks of at most `chunk_tokens` tokens, overlapping
+    by `overlap_tokens`, so every chunk fits an embedding or prompt budget
+    regardless of how many characters its tokens span.
+
+    Each document is tokenized once into an array of token start offsets
+    (see `tokenization.token_offsets`, which also caches it), and chunks are
+    cut on that array. A cut snaps back to the last sentence end within the
+    final quarter of the budget, if there is one, else falls exactly on the
+    budget. Counts refer to the whole-document tokenization; re-encoding
+    a chunk on its own can differ by a token at its edges.
+    """
+
+    def __init__(
+        self,
+        chunk_tokens: int = 256,
+        overlap_tokens: int = 32,
+        encoding_name: str = "cl100k_base",
+    ):
+        assert (
+            chunk_tokens > overlap_tokens
+        ), "Chunk size must be greater than chunk overlap"
+
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.encoding_name = encoding_name
+
+    def _cuts(self, text: str, offsets: np.ndarray) -> List[Tuple[int, int]]:
+        """(first, stop) token ranges of the chunks, given the token start `offsets`."""
+        n_tokens = len(offsets)
+        # Cutting before a token is clean when the last non-whitespace
+        # character preceding it ends a sentence
+        codes = _code_points(text)
+        positions = np.arange(len(codes))
+        last_visible = np.maximum.accumulate(np.where(np.isin(codes, _WHITESPACE), -1, positions))
+        before = last_visible[np.maximum(offsets - 1, 0)]
+        is_boundary = (offsets > 0) & (before >= 0) & np.isin(codes[np.maximum(before, 0)], _SENTENCE_ENDS)
+        boundaries = np.flatnonzero(is_boundary).tolist()
+
+        cuts = []
+        first = 0
+        while first < n_tokens:
+            stop = first + self.chunk_tokens
+            if stop >= n_tokens:
+                cuts.append((first, n_tokens))
+                break
+            i = bisect.bisect_right(boundaries, stop) - 1
+            if i >= 0 and boundaries[i] > stop - max(1, self.chunk_tokens // 4):
+                stop = boundaries[i]
+            cuts.append((first, stop))
+            first = stop - self.overlap_tokens if stop - self.overlap_tokens > first else stop
+        return cuts
+
+    def split_with_offsets(self, text: str) -> List[Tuple[str, int, int]]:
+        """(chunk, start, end) with `chunk == text[start:end]`, stripped of outer whitespace."""
+        offsets = token_offsets(text, self.encoding_name)
+        spans = []
+        for first, stop in self._cuts(text, offsets):
+            start = int(offsets[first])
+            end = int(offsets[stop]) if stop < len(offsets) else len(text)
+            chunk = text[start:end]
+            stripped = chunk.strip()
+            if not stripped:
+                continue
+            start += len(chunk) - len(chunk.lstrip())
+            spans.append((stripped, start, start + len(stripped)))
+        return spans
+
+    def split(self, text: str) -> List[str]:
+        return [chunk for chunk, _, _ in self.split_with_offsets(text)]
+
+    def split_texts(self, texts: List[str]) -> List[str]:
+        chunks = []
+        for text in texts:
+            chunks.extend(self.split(text))
+        return chunks
+
+
 class PDFLoader:
     def __init__(self, path: str):
         self.documents = []
@@ -76,6 +350,10 @@ class PDFLoader:
         print(f"Is directory: {os.path.isdir(self.path)}")
         print(f"File permissions: {oct(os.stat(self.path).st_mode)[-3:]}")
         
+        if os.path.isdir(self.path):
+            self.load_directory()
+            return
+        
         try:
             # Try to open the file first to verify access
             with open(self.path, 'rb') as test_file:
@@ -90,57 +368,83 @@ class PDFLoader:
             raise ValueError(f"Error processing file at '{self.path}': {str(e)}")
 
     def load_file(self):
-        with open(self.path, 'rb') as file:
-            # Create PDF reader object
-            pdf_reader = PyPDF2.PdfReader(file)
-            
-            # Extract text from each page
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            
-            self.documents.append(text)
+        self.documents.append(_read_pdf_file(self.path))
 
     def load_directory(self):
-        for root, _, files in os.walk(self.path):
-            for file in files:
-                if file.lower().endswith('.pdf'):
-                    file_path = os.path.join(root, file)
-                    with open(file_path, 'rb') as f:
-                        pdf_reader = PyPDF2.PdfReader(f)
-                        
-                        # Extract text from each page
-                        text = ""
-                        for page in pdf_reader.pages:
-                            text += page.extract_text() + "\n"
-                        
-                        self.documents.append(text)
+        for path, text, error in self.iter_documents():
+            if error is not None:
+                raise ValueError(f"Error processing file at '{path}': {error}")
+            self.documents.append(text)
+
+    def iter_documents(
+        self, max_workers: Optional[int] = None, max_in_flight: Optional[int] = None
+    ) -> Iterator[LoadedFile]:
+        """
+        Lazily yields `(path, text, error)` for every PDF under the
+        directory (or for the file itself), parsed in a process pool; see
+        `iter_load_files`. Nothing is added to `self.documents`.
+        """
+        if os.path.isdir(self.path):
+            paths = (
+                os.path.join(root, file)
+                for root, _, files in os.walk(self.path)
+                for file in files
+                if file.lower().endswith('.pdf')
+            )
+        else:
+            paths = [self.path]
+        return iter_load_files(paths, _read_pdf_file, max_workers, max_in_flight)
 
     def load_documents(self):
         self.load()
         return self.documents
 
 
-def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+def _normalize(text: str) -> str:
+    """`re.sub(r'\\s+', ' ', text.strip())`, in about a third of the time."""
+    # str.split and the re `\\s` class both use str.isspace, so this is exact
+    return ' '.join(text.split())
+
+
+_SENTENCE_ENDS = [ord('.'), ord('?'), ord('!')]
+_WHITESPACE = [ord(c) for c in ' \t\n\r\x0b\x0c']
+
+
+def _code_points(text: str) -> np.ndarray:
+    """`text` as an array of code points, indexed by character offset."""
+    if text.isascii():
+        return np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+    # UTF-32 has one code unit per character, so indexes stay offsets
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+
+
+def _boundary_positions(text: str) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Split a text into overlapping chunks of approximately equal size.
-    
-    Args:
-        text (str): The input text to be chunked
-        chunk_size (int): Target size for each chunk in characters
-        overlap (int): Number of characters to overlap between chunks
-        
-    Returns:
-        List[str]: List of text chunks
+    Every sentence end ('.', '?', '!') and every space in `text`, as sorted
+    arrays, found in one vectorized pass over the buffer.
     """
-    # Clean and normalize text
-    text = re.sub(r'\s+', ' ', text.strip())
+    codes = _code_points(text)
+    sentence_ends = (codes == _SENTENCE_ENDS[0]) | (codes == _SENTENCE_ENDS[1]) | (codes == _SENTENCE_ENDS[2])
+    return np.flatnonzero(sentence_ends), np.flatnonzero(codes == ord(' '))
+
+
+def _chunk_spans(text: str, chunk_size: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    (start, end) offsets of the chunks `chunk_text` produces, within the
+    already whitespace-normalized `text`.
     
+    Boundary positions are found once up front; each cut is then a binary
+    search instead of four `rfind` scans. If a cut would not move the next
+    chunk's start forward (a long run without boundaries and a large
+    overlap), the next chunk starts at the cut instead, so the loop always
+    terminates and never emits near-duplicate chunks.
+    """
     # If text is shorter than chunk_size, return it as a single chunk
     if len(text) <= chunk_size:
-        return [text]
+        return [(0, len(text))]
     
-    chunks = []
+    sentence_ends, spaces = _boundary_positions(text)
+    spans = []
     start = 0
     
     while start < len(text):
@@ -149,35 +453,280 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[st
         
         if end >= len(text):
             # If we're at the end, just take the rest
-            chunks.append(text[start:])
+            spans.append((start, len(text)))
             break
-            
-        # Try to find a sentence boundary within the last 200 characters of the chunk
-        last_period = text.rfind('.', end - 200, end)
-        last_question = text.rfind('?', end - 200, end)
-        last_exclamation = text.rfind('!', end - 200, end)
         
-        # Find the latest sentence boundary
-        sentence_end = max(last_period, last_question, last_exclamation)
+        window = end - 200
+        if window < 0:
+            # Same as rfind: a negative start counts from the end of the text
+            window = max(0, len(text) + window)
+        end = _cut(sentence_ends, spaces, start, end, window)
+        spans.append(_strip_span(text, start, end))
+        start = end - overlap if end - overlap > start else end
+    
+    return spans
+
+
+def _cut(sentence_ends: np.ndarray, spaces: np.ndarray, start: int, end: int, window: int) -> int:
+    """
+    Where a chunk starting at `start` with tentative `end` is cut: after the
+    last sentence end in [window, end), else at the last space there, else
+    at `end`; boundaries as found by `_boundary_positions`, in the same
+    coordinates as the other arguments.
+    """
+    for positions, after in ((sentence_ends, 1), (spaces, 0)):
+        i = positions.searchsorted(end)
+        if i:
+            position = int(positions[i - 1])
+            if position >= window and position > start:
+                return position + after
+    return end
+
+
+def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    """Equivalent of `text[start:end].strip()` on normalized text, as offsets."""
+    while start < end and text[start] == ' ':
+        start += 1
+    while end > start and text[end - 1] == ' ':
+        end -= 1
+    return start, end
+
+
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    """
+    Split a text into overlapping chunks of approximately equal size.
+    
+    Args:
+        text (str): The input text to be chunked
+        chunk_size (int): Target size for each chunk in characters
+        overlap (int): Number of characters to overlap between chunks
         
-        if sentence_end > start:
-            # If we found a sentence boundary, use it
-            end = sentence_end + 1
-            chunks.append(text[start:end].strip())
-            start = end - overlap
-        else:
-            # If no space found, just cut at a space
-            last_space = text.rfind(' ', end - 200, end)
-            if last_space > start:
-                end = last_space
-                chunks.append(text[start:end].strip())
-                start = end - overlap
-            else:
-                # If no space found, just cut at chunk_size
-                chunks.append(text[start:end].strip())
-                start = end - overlap
+    Returns:
+        List[str]: List of text chunks
+    """
+    # Clean and normalize text
+    text = _normalize(text)
+    return [text[start:end] for start, end in _chunk_spans(text, chunk_size, overlap)]
+
+
+def chunk_text_with_offsets(
+    text: str, chunk_size: int = 1000, overlap: int = 200
+) -> List[Tuple[str, int, int]]:
+    """
+    Same chunks as `chunk_text`, each with its character span in the original text.
+    
+    Args:
+        text (str): The input text to be chunked
+        chunk_size (int): Target size for each chunk in characters
+        overlap (int): Number of characters to overlap between chunks
+        
+    Returns:
+        List[Tuple[str, int, int]]: (chunk, start, end) where `text[start:end]`
+        is the source of the chunk before whitespace normalization
+    """
+    stripped = text.strip()
+    lead = len(text) - len(text.lstrip())
+    normalized = _normalize(stripped)
+    # Breakpoints (normalized offset, original offset) after every whitespace run
+    normalized_starts = [0]
+    original_starts = [lead]
+    shift = 0
+    for match in re.finditer(r'\s+', stripped):
+        shift += len(match.group()) - 1
+        normalized_starts.append(match.end() - shift)
+        original_starts.append(lead + match.end())
+
+    def to_original(position: int, is_end: bool) -> int:
+        # An end offset maps from the last character it covers
+        lookup = position - 1 if is_end and position > 0 else position
+        i = bisect.bisect_right(normalized_starts, lookup) - 1
+        return original_starts[i] + (position - normalized_starts[i])
+
+    return [
+        (normalized[start:end], to_original(start, False), to_original(end, True))
+        for start, end in _chunk_spans(normalized, chunk_size, overlap)
+    ]
+
+
+def _normalized_pieces(source: Union[Iterable[str], IO[str]], read_size: int) -> Iterator[str]:
+    """
+    Pieces of `re.sub(r'\s+', ' ', text.strip())` for the concatenation of
+    `source`, computed piece by piece: whitespace runs spanning two pieces
+    collapse to one space and leading/trailing whitespace is dropped.
+    """
+    pieces = iter(lambda: source.read(read_size), "") if hasattr(source, "read") else source
+    started = False
+    pending_space = False
+    for piece in pieces:
+        normalized = re.sub(r'\s+', ' ', piece)
+        core = normalized.strip(' ')
+        if not core:
+            pending_space = pending_space or bool(normalized)
+            continue
+        space = started and (pending_space or normalized[0] == ' ')
+        pending_space = normalized[-1] == ' '
+        started = True
+        yield ' ' + core if space else core
+
+
+def iter_chunk_text(
+    source: Union[Iterable[str], IO[str]],
+    chunk_size: int = 1000,
+    overlap: int = 200,
+    read_size: int = 1 << 16,
+) -> Iterator[str]:
+    """
+    Streaming `chunk_text`: yields the same chunks lazily from a text file
+    object (read `read_size` characters at a time) or any iterable of
+    strings (e.g. lines or decoded upload blocks).
+    
+    Only about `chunk_size + read_size` characters are held at once, so
+    memory stays bounded whatever the document size.
+    
+    Args:
+        source: File-like object with `read`, or an iterable of strings
+        chunk_size (int): Target size for each chunk in characters
+        overlap (int): Number of characters to overlap between chunks
+        read_size (int): Characters read per `read` call on file objects
+        
+    Yields:
+        str: Text chunks, identical to `chunk_text("".join(source))`
+    """
+    pieces = _normalized_pieces(source, read_size)
+    buffer = ""
+    offset = 0  # position of buffer[0] in the normalized text
+    start = 0
+    eof = False
+    # Boundaries in the buffer, as positions in the normalized text; only
+    # newly read text is scanned
+    sentence_ends = spaces = np.empty(0, dtype=np.int64)
+    while True:
+        # Read until the next cut is decided: past `end` by two characters
+        # (one may be a trailing space that EOF strips) and past 200, so a
+        # negative window resolves as it would on the whole text.
+        need = max(start + chunk_size + 2, 202)
+        if not eof and offset + len(buffer) < need:
+            keep = max(0, min(start, start + chunk_size - 200)) - offset
+            parts = [buffer[keep:]]
+            offset += keep
+            length = len(parts[0])
+            while offset + length < need:
+                piece = next(pieces, None)
+                if piece is None:
+                    eof = True
+                    break
+                parts.append(piece)
+                length += len(piece)
+            buffer = "".join(parts)
+            new_ends, new_spaces = _boundary_positions(buffer[len(parts[0]) :])
+            new_start = offset + len(parts[0])
+            sentence_ends = np.concatenate(
+                (sentence_ends[np.searchsorted(sentence_ends, offset) :], new_ends + new_start)
+            )
+            spaces = np.concatenate((spaces[np.searchsorted(spaces, offset) :], new_spaces + new_start))
+        total = offset + len(buffer) if eof else None
+        if total is not None and start == 0 and total <= chunk_size:
+            yield buffer
+            return
+        if total is not None and start >= total:
+            return
+        end = start + chunk_size
+        if total is not None and end >= total:
+            yield buffer[start - offset :]
+            return
+        window = end - 200
+        if window < 0:
+            # As in `_chunk_spans`, a negative window counts from the end of the whole text
+            window = max(0, total + window) if total is not None else end
+        end = _cut(sentence_ends, spaces, start, end, window)
+        chunk_start, chunk_end = _strip_span(buffer, start - offset, end - offset)
+        yield buffer[chunk_start:chunk_end]
+        start = end - overlap if end - overlap > start else end
+
+
+def iter_csv_lines(source: Union[bytes, bytearray, IO[str], IO[bytes]], encoding: str = "utf-8") -> Iterator[str]:
+    """
+    The rows of a CSV file object (text opened with `newline=""`, or binary)
+    or raw upload bytes, each flattened to "a, b, c", parsed one row at a
+    time. A binary file object is decoded in place from its current position
+    and left open, so one `io.BytesIO` over an upload can be read again
+    after a `seek(0)` instead of wrapping (and copying) the bytes per pass.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    if isinstance(source, io.TextIOBase):
+        for row in csv.reader(source):
+            yield ", ".join(row)
+        return
+    text = io.TextIOWrapper(source, encoding=encoding, newline="")
+    try:
+        for row in csv.reader(text):
+            yield ", ".join(row)
+    finally:
+        # Hand the binary object back instead of closing it with the wrapper
+        text.detach()
+
+
+def iter_csv_chunks(
+    lines: Iterable[str],
+    max_chars: int = 1000,
+    max_tokens: Optional[int] = None,
+    encoding_name: str = "cl100k_base",
+) -> Iterator[Tuple[str, int, int, int, int]]:
+    """
+    Groups CSV lines (the first one being the header, e.g. from
+    `iter_csv_lines`) into chunks of whole rows, each starting with the
+    header so every chunk is self-describing. A chunk grows until the next
+    row would push it past `max_chars` characters or, if set, `max_tokens`
+    tokens; a row that does not fit even on its own gets a chunk of its own.
+    Only the current chunk's rows are held at a time.
     
-    return chunks
+    Yields:
+        (chunk, char_start, char_end, row_start, row_end): the rows'
+        character span in `"\n".join(lines)` and their line numbers
+        (0-based, header included, so data rows start at 1)
+    """
+    lines = iter(lines)
+    header = next(lines, None)
+    if header is None:
+        return
+
+    def cost(line: str) -> int:
+        return count_tokens(line, encoding_name) + 1 if max_tokens else len(line) + 1
+
+    budget = max_tokens or max_chars
+    rows: List[str] = []
+    size = header_size = cost(header) - 1
+    position = len(header) + 1  # where the next row starts in the joined text
+    row_start = char_start = None
+    for row_number, line in enumerate(lines, 1):
+        line_cost = cost(line)
+        if rows and size + line_cost > budget:
+            yield "\n".join([header, *rows]), char_start, position - 1, row_start, row_number - 1
+            rows = []
+            size = header_size
+        if not rows:
+            row_start, char_start = row_number, position
+        rows.append(line)
+        size += line_cost
+        position += len(line) + 1
+    if rows:
+        yield "\n".join([header, *rows]), char_start, position - 1, row_start, row_start + len(rows) - 1
+    elif row_start is None:
+        # Header only
+        yield header, 0, len(header), 0, 0
+
+
+def batched(chunks: Iterable[str], batch_size: int) -> Iterator[List[str]]:
+    """Groups a chunk stream into lists of at most `batch_size`, e.g. one embedding request each."""
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 if __name__ == "__main__":
@@ -0,0 +1,132 @@
+import functools
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+# Approximates BPE pre-tokenization: an optional leading space plus up to 4
+# letters, up to 3 digits or up to 4 symbols, or whitespace. Common English
+# words come out as one token and long or rare ones as several, so counts
+# err slightly high, which is the safe side for request limits.
+_FALLBACK_TOKEN = re.compile(r" ?[^\W\d_]{1,4}| ?\d{1,3}| ?(?:[^\s\w]|_){1,4}|\s+(?!\S)|\s")
+
+
+class Tokenizer:
+    """Maps text to the character offset where each of its tokens starts."""
+
+    name = "base"
+
+    def offsets(self, text: str) -> np.ndarray:
+        raise NotImplementedError
+
+
+class TiktokenTokenizer(Tokenizer):
+    """Exact counts for OpenAI models, through a `tiktoken` encoding."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.name = encoding.name
+
+    def offsets(self, text: str) -> np.ndarray:
+        tokens = self.encoding.encode_ordinary(text)
+        _, offsets = self.encoding.decode_with_offsets(tokens)
+        return np.asarray(offsets, dtype=np.int64)
+
+
+class RegexTokenizer(Tokenizer):
+    """Dependency-free estimate used when `tiktoken` is not installed."""
+
+    name = "regex"
+
+    def offsets(self, text: str) -> np.ndarray:
+        return np.fromiter((match.start() for match in _FALLBACK_TOKEN.finditer(text)), dtype=np.int64)
+
+
+@functools.lru_cache(maxsize=None)
+def get_tokenizer(encoding_name: str = "cl100k_base") -> Tokenizer:
+    """
+    The shared tokenizer for `encoding_name`, loaded once per process:
+    a `tiktoken` encoding when the package is installed, else `RegexTokenizer`.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return RegexTokenizer()
+    return TiktokenTokenizer(tiktoken.get_encoding(encoding_name))
+
+
+class _OffsetsCache:
+    """
+    LRU of token offset arrays keyed by a digest of the text, so cached
+    entries do not keep whole documents alive. Bounded by entry count and
+    by the total bytes of the arrays.
+    """
+
+    def __init__(self, max_entries: int = 8, max_bytes: int = 32 << 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[bytes, str], np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str, encoding_name: str) -> Tuple[bytes, str]:
+        digest = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        return digest, encoding_name
+
+    def get(self, key: Tuple[bytes, str]) -> Optional[np.ndarray]:
+        with self._lock:
+            offsets = self._entries.get(key)
+            if offsets is not None:
+                self._entries.move_to_end(key)
+            return offsets
+
+    def put(self, key: Tuple[bytes, str], offsets: np.ndarray) -> None:
+        if offsets.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = offsets
+            self._bytes += offsets.nbytes
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+_offsets_cache = _OffsetsCache()
+
+
+def token_offsets(text: str, encoding_name: str = "cl100k_base") -> np.ndarray:
+    """
+    Start offset of every token of `text`. The arrays of the last few texts
+    are kept (by content digest, up to 32 MB), so splitting the same
+    document again (say with another budget) skips tokenization. Treat the
+    result as read-only.
+    """
+    key = _offsets_cache.key(text, encoding_name)
+    offsets = _offsets_cache.get(key)
+    if offsets is None:
+        offsets = get_tokenizer(encoding_name).offsets(text)
+        if len(text) < 2**31:
+            offsets = offsets.astype(np.int32)  # half the cache footprint
+        offsets.setflags(write=False)
+        _offsets_cache.put(key, offsets)
+    return offsets
+
+
+def clear_token_offsets_cache() -> None:
+    _offsets_cache.clear()
+
+
+def count_tokens(text: str, encoding_name: str = "cl100k_base") -> int:
+    return len(get_tokenizer(encoding_name).offsets(text))
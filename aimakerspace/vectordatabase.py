@@ -1,7 +1,16 @@
 import numpy as np
-from typing import List, Tuple, Callable, Optional, Union, Dict
+from typing import Any, List, Tuple, Callable, Optional, Union, Dict, Set, Iterable
 from aimakerspace.openai_utils.embedding import EmbeddingModel
+from aimakerspace.indexes import FlatIndex, top_k
+from aimakerspace.storage import Float32Storage, STORAGES
+from aimakerspace.metadata import MetadataIndex, validate_where
+from aimakerspace.lexical import BM25Index, reciprocal_rank_fusion
+from aimakerspace.text_utils import batched
+from aimakerspace.metrics import METRICS, Metric, get_metric, register_pairwise_equivalent
 import asyncio
+import json
+import os
+import sys
 
 
 def cosine_similarity(vector_a: np.ndarray, vector_b: np.ndarray) -> float:
@@ -12,52 +21,791 @@ def cosine_similarity(vector_a: np.ndarray, vector_b: np.ndarray) -> float:
     return dot_product / (norm_a * norm_b)
 
 
+register_pairwise_equivalent(cosine_similarity, "cosine")
+
+_INT_SIZE = sys.getsizeof(2**30)
+_ID_LIST_SIZE = sys.getsizeof([0])
+
+
+def _normalize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """L2-normalizes the last axis, leaving all-zero vectors untouched."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True).astype(np.float32)
+    safe = np.where(norms == 0, 1, norms)
+    return (vectors / safe).astype(np.float32, copy=False), norms[..., 0]
+
+
 class VectorDatabase:
-    def __init__(self):
-        self.vectors: Dict[str, np.ndarray] = {}  # key: str, value: np.ndarray
-        # No embedding_model at construction
+    """
+    In-memory vector store backed by one contiguous row storage.
+
+    Rows are L2-normalized on insert and their original norms are kept
+    alongside, so cosine search is a single matrix-vector product while
+    `retrieve_from_key` still returns the vector as it was inserted.
+
+    Every row gets a stable integer id. `add` always appends, so identical
+    texts from different documents are kept apart, while `insert` keeps the
+    original upsert-by-key behaviour. `delete` only tombstones rows; once
+    more than `compact_threshold` of the rows are tombstones (or whenever
+    `compact()` is called) the storage is rebuilt densely. Ids survive
+    compaction.
+
+    Rows can carry a metadata dict (document id, page, offsets, ...). It is
+    stored column-wise with posting lists per value, and every search
+    accepts `where={...}` (see `MetadataIndex`) so that only matching rows
+    are scored.
+
+    With `lexical=True` the keys are also indexed in a BM25 inverted index.
+    `search_by_text(mode="lexical")` then answers without an embedding
+    call, and `mode="hybrid"` fuses vector and BM25 rankings with
+    reciprocal rank fusion, which recovers exact identifiers and names that
+    embeddings tend to miss.
+
+    `storage` decides how rows are held: `Float32Storage` (the default) is
+    exact, `Int8Storage` and `PQStorage` compress rows and score them with
+    asymmetric distance computation. Cosine searches go through `index`:
+    `FlatIndex` (the default) is exact, while `IVFIndex(nprobe=...)` trades
+    recall for sub-linear latency.
+
+    `distance_measure` may also name a metric from `aimakerspace.metrics`
+    ("dot", "neg_l2", "manhattan", ...), which scores every row in one
+    vectorized pass; any other callable is applied pair by pair.
+    """
+
+    _snapshot_version = 1
+
+    def __init__(
+        self,
+        index=None,
+        storage: Optional[Float32Storage] = None,
+        compact_threshold: Optional[float] = 0.25,
+        lexical: bool = False,
+    ):
+        self.index = index if index is not None else FlatIndex()
+        self.storage = storage if storage is not None else Float32Storage()
+        self.compact_threshold = compact_threshold
+        self.lexical_enabled = lexical
+        # Bumped by every change to rows or metadata, so holders of a size
+        # estimate (e.g. `CollectionCache`) know when to re-measure `nbytes`
+        self.mutations = 0
+        self._reset_rows()
+
+    def _reset_rows(self) -> None:
+        self._keys: List[str] = []  # row -> key
+        self._ids: List[int] = []  # row -> id
+        self._id_to_row: Dict[int, int] = {}
+        self._key_to_ids: Dict[str, List[int]] = {}  # insertion order
+        self._deleted: Set[int] = set()  # tombstoned rows
+        self.metadata = MetadataIndex()
+        self.lexical: Optional[BM25Index] = BM25Index() if self.lexical_enabled else None
+        self._live_mask: Optional[np.ndarray] = None
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self.storage) - len(self._deleted)
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self.storage.dim
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """
+        Normalized rows, shape (rows, dim), tombstones included until the next
+        compaction; a view for float32 storage, decoded otherwise.
+        """
+        return self.storage.vectors()
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate resident size: encoded rows and norms, keys and id
+        bookkeeping, and the metadata and BM25 indexes.
+        """
+        size = self.storage.nbytes + self.metadata.nbytes
+        if self.lexical is not None:
+            size += self.lexical.nbytes
+        size += sys.getsizeof(self._keys) + sum(sys.getsizeof(key) for key in self._key_to_ids)
+        size += sys.getsizeof(self._ids) + sys.getsizeof(self._id_to_row) + sys.getsizeof(self._key_to_ids)
+        # An int object per id and per row number, and a one-id list per key in the common case
+        size += 2 * _INT_SIZE * len(self._ids) + _ID_LIST_SIZE * len(self._key_to_ids)
+        return size
+
+    def keys(self) -> List[str]:
+        """Keys of live rows in row order (repeated if added more than once)."""
+        return [key for row, key in enumerate(self._keys) if row not in self._deleted]
+
+    def ids(self) -> List[int]:
+        """Ids of live rows in row order."""
+        return [id_ for row, id_ in enumerate(self._ids) if row not in self._deleted]
+
+    @property
+    def vectors(self) -> Dict[str, np.ndarray]:
+        """Key -> vector mapping, rebuilt on access for backwards compatibility."""
+        return {key: self.retrieve_from_key(key) for key in self._key_to_ids}
+
+    def _live(self, where: Optional[Dict[str, Any]] = None) -> Optional[np.ndarray]:
+        """
+        Boolean mask of live rows matching `where`, or None when every row
+        qualifies (no tombstones and no filter).
+        """
+        if self._deleted and self._live_mask is None:
+            mask = np.ones(len(self.storage), dtype=bool)
+            mask[list(self._deleted)] = False
+            self._live_mask = mask
+        if not where:
+            return self._live_mask if self._deleted else None
+        mask = self.metadata.mask(where, len(self.storage))
+        if self._deleted:
+            mask &= self._live_mask
+        return mask
+
+    @staticmethod
+    def _prepare(keys: List[str], vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(keys) != vectors.shape[0]:
+            raise ValueError("vectors must be a 2-D array with one row per key")
+        return _normalize(vectors)
+
+    def _append(
+        self,
+        keys: List[str],
+        normalized: np.ndarray,
+        norms: np.ndarray,
+        ids: List[int],
+        metadatas: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ) -> None:
+        rows = self.storage.append(normalized, norms)
+        self.metadata.append(metadatas if metadatas is not None else [None] * len(keys))
+        if self.lexical is not None:
+            self.lexical.append(keys)
+        for key, row, id_ in zip(keys, rows, ids):
+            self._keys.append(key)
+            self._ids.append(id_)
+            self._id_to_row[id_] = int(row)
+            self._key_to_ids.setdefault(key, []).append(id_)
+        self._next_id = max(self._next_id, max(ids) + 1)
+        self._live_mask = None
+        self.mutations += 1
+        self.index.add(self.storage, rows)
+
+    def add_many(
+        self,
+        keys: List[str],
+        vectors: np.ndarray,
+        metadata: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ) -> np.ndarray:
+        """Appends vectors as new rows, even for keys already present, and returns their ids."""
+        normalized, norms = self._prepare(keys, vectors)
+        if not keys:
+            return np.empty(0, dtype=np.int64)
+        ids = list(range(self._next_id, self._next_id + len(keys)))
+        self._append(list(keys), normalized, norms, ids, metadata)
+        return np.array(ids, dtype=np.int64)
+
+    def add(self, key: str, vector: np.ndarray, metadata: Optional[Dict[str, Any]] = None) -> int:
+        return int(self.add_many([key], np.asarray(vector).reshape(1, -1), [metadata])[0])
+
+    def upsert_many(
+        self,
+        ids: List[int],
+        vectors: np.ndarray,
+        keys: Optional[List[str]] = None,
+        metadata: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ) -> None:
+        """
+        Replaces the vectors (and keys and metadata, if given) of existing
+        ids in place; ids that do not exist yet are added under that id.
+        """
+        ids = [int(id_) for id_ in ids]
+        if not ids:
+            return
+        if keys is None:
+            keys = [self.get_key(id_) or "" for id_ in ids]
+        normalized, norms = self._prepare(keys, vectors)
+        latest = {id_: i for i, id_ in enumerate(ids)}  # last write wins within a batch
+        existing = [i for id_, i in latest.items() if id_ in self._id_to_row]
+        new = [i for id_, i in latest.items() if id_ not in self._id_to_row]
+        if existing:
+            rows = np.array([self._id_to_row[ids[i]] for i in existing])
+            self.storage.update(rows, normalized[existing], norms[existing])
+            for i, row in zip(existing, rows):
+                old_key = self._keys[row]
+                if keys[i] != old_key:
+                    if self.lexical is not None:
+                        self.lexical.update(row, old_key, keys[i])
+                    self._forget_key(old_key, ids[i])
+                    self._keys[row] = keys[i]
+                    self._key_to_ids.setdefault(keys[i], []).append(ids[i])
+                if metadata is not None:
+                    self.metadata.update(row, metadata[i])
+            self.mutations += 1
+            self.index.add(self.storage, rows)
+        if new:
+            self._append(
+                [keys[i] for i in new],
+                normalized[new],
+                norms[new],
+                [ids[i] for i in new],
+                None if metadata is None else [metadata[i] for i in new],
+            )
+
+    def upsert(
+        self,
+        id_: int,
+        vector: np.ndarray,
+        key: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.upsert_many(
+            [id_],
+            np.asarray(vector).reshape(1, -1),
+            None if key is None else [key],
+            None if metadata is None else [metadata],
+        )
+
+    def insert(self, key: str, vector: np.ndarray, metadata: Optional[Dict[str, Any]] = None) -> None:
+        self.insert_many([key], np.asarray(vector).reshape(1, -1), None if metadata is None else [metadata])
+
+    def insert_many(
+        self,
+        keys: List[str],
+        vectors: np.ndarray,
+        metadata: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ) -> None:
+        """Inserts a batch of vectors; existing keys are overwritten in place."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(keys) == 0:
+            return
+        new_ids = {}
+        ids = []
+        for key in keys:
+            if key in self._key_to_ids:
+                ids.append(self._key_to_ids[key][-1])
+            else:
+                ids.append(new_ids.setdefault(key, self._next_id + len(new_ids)))
+        self.upsert_many(ids, vectors, list(keys), metadata)
+
+    def _forget_key(self, key: str, id_: int) -> None:
+        key_ids = self._key_to_ids[key]
+        key_ids.remove(id_)
+        if not key_ids:
+            del self._key_to_ids[key]
+
+    def delete_many(self, ids: List[int]) -> int:
+        """Tombstones the given ids in O(1) each and returns how many existed."""
+        deleted = 0
+        for id_ in ids:
+            row = self._id_to_row.pop(int(id_), None)
+            if row is None:
+                continue
+            self._deleted.add(row)
+            self._forget_key(self._keys[row], int(id_))
+            deleted += 1
+        if deleted:
+            self._live_mask = None
+            self.mutations += 1
+            if self.compact_threshold is not None and len(self._deleted) > self.compact_threshold * len(self.storage):
+                self.compact()
+        return deleted
+
+    def delete(self, id_: int) -> bool:
+        return self.delete_many([id_]) == 1
+
+    def delete_key(self, key: str) -> int:
+        """Deletes every row stored under `key`."""
+        return self.delete_many(list(self._key_to_ids.get(key, [])))
+
+    def compact(self) -> None:
+        """Rebuilds the storage without tombstoned rows; ids are preserved."""
+        if not self._deleted:
+            return
+        rows = np.flatnonzero(self._live())
+        keys = [self._keys[row] for row in rows]
+        ids = [self._ids[row] for row in rows]
+        next_id = self._next_id
+        metadata, lexical = self.metadata, self.lexical
+        metadata.compact(rows)
+        if lexical is not None:
+            lexical.compact(rows)
+        self.storage.compact(rows)
+        self._reset_rows()
+        self._next_id = next_id
+        self.metadata, self.lexical = metadata, lexical
+        self._keys, self._ids = keys, ids
+        self._id_to_row = {id_: row for row, id_ in enumerate(ids)}
+        for key, id_ in zip(keys, ids):
+            self._key_to_ids.setdefault(key, []).append(id_)
+        self.mutations += 1
+        self.index.reset()
+        self.index.add(self.storage, np.arange(len(rows)))
 
-    def insert(self, key: str, vector: np.ndarray) -> None:
-        self.vectors[key] = vector
+    def get_key(self, id_: int) -> Optional[str]:
+        row = self._id_to_row.get(int(id_))
+        return None if row is None else self._keys[row]
+
+    def get_metadata(self, id_: int) -> Optional[Dict[str, Any]]:
+        row = self._id_to_row.get(int(id_))
+        return None if row is None else self.metadata.get(row)
+
+    def update_metadata(self, id_: int, metadata: Optional[Dict[str, Any]]) -> bool:
+        """Replaces the metadata of an existing id, leaving its vector alone."""
+        row = self._id_to_row.get(int(id_))
+        if row is None:
+            return False
+        self.metadata.update(row, metadata)
+        self.mutations += 1
+        return True
+
+    def add_metadata_aliases(self, id_: int, metadatas: List[Dict[str, Any]]) -> bool:
+        """
+        Makes `where` filters also match an existing id through each of
+        `metadatas` (e.g. the spans of duplicates it stands for); replacing
+        its metadata drops them.
+        """
+        row = self._id_to_row.get(int(id_))
+        if row is None:
+            return False
+        self.metadata.add_aliases(row, metadatas)
+        self.mutations += 1
+        return True
+
+    def get_metadata_aliases(self, id_: int) -> List[Dict[str, Any]]:
+        row = self._id_to_row.get(int(id_))
+        return [] if row is None else self.metadata.aliases(row)
+
+    def retrieve(self, id_: int) -> Optional[np.ndarray]:
+        """The vector stored under an id, as it was inserted."""
+        row = self._id_to_row.get(int(id_))
+        if row is None:
+            return None
+        return self.storage.vectors(np.array([row]))[0] * self.storage.norms[row]
+
+    def _results(self, rows: np.ndarray, scores: np.ndarray) -> List[Tuple[str, float]]:
+        return [(self._keys[row], float(score)) for row, score in zip(rows, scores) if row >= 0]
+
+    def _search_rows(
+        self, queries: np.ndarray, k: int, where: Optional[Dict[str, Any]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Cosine top-k rows for normalized queries, re-ranked exactly if the storage keeps originals."""
+        rescore_factor = self.storage.rescore_factor
+        mask = self._live(where)
+        if not rescore_factor:
+            return self.index.search(self.storage, queries, k, mask)
+        rows, _ = self.index.search(self.storage, queries, k * rescore_factor, mask)
+        scores = np.where(rows >= 0, self.storage.rescore(queries, np.maximum(rows, 0)), -np.inf)
+        best = top_k(scores, k)
+        return np.take_along_axis(rows, best, axis=-1), np.take_along_axis(scores, best, axis=-1)
+
+    def _metric_search_rows(
+        self, metric: Metric, queries: np.ndarray, k: int, where: Optional[Dict[str, Any]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k rows for raw queries under a batched metric, scoring all live rows at once."""
+        mask = self._live(where)
+        live_rows = None if mask is None else np.flatnonzero(mask)
+        scores = metric.score(self.storage, queries, live_rows)
+        best = top_k(scores if metric.higher_is_better else -scores, k)
+        scores = np.take_along_axis(scores, best, axis=-1)
+        return (best if live_rows is None else live_rows[best]), scores
 
     def search(
         self,
         query_vector: np.ndarray,
         k: int,
-        distance_measure: Callable = cosine_similarity,
+        distance_measure: Union[Callable, str, Metric] = cosine_similarity,
+        where: Optional[Dict[str, Any]] = None,
     ) -> List[Tuple[str, float]]:
-        scores = [
-            (key, distance_measure(query_vector, vector))
-            for key, vector in self.vectors.items()
-        ]
-        return sorted(scores, key=lambda x: x[1], reverse=True)[:k]
+        if len(self) == 0:
+            return []
+        metric = get_metric(distance_measure)
+        if metric is not None:
+            return self.search_many(np.asarray(query_vector).reshape(1, -1), k, metric, where=where)[0]
+        # Arbitrary callables only see one pair at a time, so fall back to
+        # scoring the original (de-normalized) vectors one by one.
+        mask = self._live(where)
+        live_rows = np.arange(len(self.storage)) if mask is None else np.flatnonzero(mask)
+        raw = self.storage.vectors(live_rows) * self.storage.norms[live_rows, None]
+        scores = np.array(
+            [distance_measure(query_vector, vector) for vector in raw],
+            dtype=np.float64,
+        )
+        best = top_k(scores, k)
+        return self._results(live_rows[best], scores[best])
+
+    def _mmr_rows(
+        self,
+        queries: np.ndarray,
+        k: int,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Maximal marginal relevance over the top `fetch_k` cosine candidates
+        of each normalized query.
+
+        Each step picks, for every query at once, the candidate maximizing
+        `lambda_mult * relevance - (1 - lambda_mult) * max similarity to the
+        rows already picked`; candidate-candidate similarities come from one
+        batched product, so only the k greedy steps run in Python.
+        """
+        rows, relevance = self._search_rows(queries, max(fetch_k, k), where)
+        candidates = self.storage.vectors(np.maximum(rows, 0).ravel()).reshape(rows.shape + (-1,))
+        similarity = np.einsum("qid,qjd->qij", candidates, candidates)
+        batch = np.arange(len(queries))
+        available = rows >= 0
+        redundancy = np.zeros(rows.shape, dtype=np.float32)
+        picked = np.empty((len(queries), min(k, rows.shape[1])), dtype=np.int64)
+        for step in range(picked.shape[1]):
+            marginal = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * redundancy, -np.inf)
+            best = marginal.argmax(axis=1)
+            picked[:, step] = np.where(np.isneginf(marginal[batch, best]), -1, best)
+            available[batch, best] = False
+            redundancy = np.maximum(redundancy, similarity[batch, best])
+        valid = picked >= 0
+        safe = np.maximum(picked, 0)
+        return (
+            np.where(valid, np.take_along_axis(rows, safe, axis=1), -1),
+            np.take_along_axis(relevance, safe, axis=1),
+        )
+
+    def search_mmr(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Diverse top-k: relevant rows that are not near-duplicates of each
+        other (`lambda_mult=1` is plain cosine search). Scores are cosine.
+        """
+        return self.search_many_mmr(np.asarray(query_vector).reshape(1, -1), k, fetch_k, lambda_mult, where)[0]
+
+    def search_many_mmr(
+        self,
+        query_vectors: np.ndarray,
+        k: int,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        where: Optional[Dict[str, Any]] = None,
+        batch_size: int = 256,
+    ) -> List[List[Tuple[str, float]]]:
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+        if len(self) == 0:
+            return [[] for _ in query_vectors]
+        results = []
+        for start in range(0, len(query_vectors), batch_size):
+            queries, _ = _normalize(query_vectors[start : start + batch_size])
+            rows, scores = self._mmr_rows(queries, k, fetch_k, lambda_mult, where)
+            results.extend(self._results(r, s) for r, s in zip(rows, scores))
+        return results
+
+    def _require_lexical(self) -> BM25Index:
+        if self.lexical is None:
+            raise ValueError("Lexical search requires VectorDatabase(lexical=True)")
+        return self.lexical
+
+    def search_lexical(
+        self, query_text: str, k: int, where: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, float]]:
+        """BM25 keyword search; needs no embedding call."""
+        rows, scores = self._require_lexical().search(query_text, k, self._live(where))
+        return self._results(rows, scores)
+
+    def _hybrid_search(
+        self,
+        query_text: str,
+        query_vector: np.ndarray,
+        k: int,
+        where: Optional[Dict[str, Any]] = None,
+        depth: int = 50,
+    ) -> List[Tuple[str, float]]:
+        """Fuses the top `depth` vector and BM25 rows with reciprocal rank fusion."""
+        lexical = self._require_lexical()
+        depth = max(depth, k)
+        query, _ = _normalize(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))
+        vector_rows, _ = self._search_rows(query, depth, where)
+        lexical_rows, _ = lexical.search(query_text, depth, self._live(where))
+        rows, scores = reciprocal_rank_fusion([vector_rows[0], lexical_rows], k)
+        return self._results(rows, scores)
 
     def search_by_text(
         self,
         query_text: str,
         k: int,
-        distance_measure: Callable = cosine_similarity,
+        distance_measure: Union[Callable, str, Metric] = cosine_similarity,
         return_as_text: bool = False,
         api_key: Optional[str] = None,
+        where: Optional[Dict[str, Any]] = None,
+        mode: str = "vector",
+        embedding_model: Optional[EmbeddingModel] = None,
     ) -> Union[List[Tuple[str, float]], List[str]]:
-        embedding_model = EmbeddingModel()
-        query_vector = np.array(embedding_model.get_embedding(query_text, api_key=api_key))
-        results = self.search(query_vector, k, distance_measure)
+        """
+        `mode` is "vector" (embedding similarity), "lexical" (BM25 only, no
+        embedding call), "hybrid" (both, fused by reciprocal rank; scores
+        are then RRF scores and `distance_measure` is not used) or "mmr"
+        (cosine results diversified by maximal marginal relevance). Pass a
+        long-lived `embedding_model` to avoid building one per query.
+        """
+        self._check_query(mode, where)
+        query_vector = None
+        if mode != "lexical":
+            embedding_model = embedding_model or EmbeddingModel()
+            query_vector = np.array(embedding_model.get_query_embedding(query_text, api_key=api_key))
+        results = self._search_text(query_text, query_vector, k, distance_measure, where, mode)
         return [result[0] for result in results] if return_as_text else results
 
+    async def asearch_by_text(
+        self,
+        query_text: str,
+        k: int,
+        distance_measure: Union[Callable, str, Metric] = cosine_similarity,
+        return_as_text: bool = False,
+        api_key: Optional[str] = None,
+        where: Optional[Dict[str, Any]] = None,
+        mode: str = "vector",
+        embedding_model: Optional[EmbeddingModel] = None,
+    ) -> Union[List[Tuple[str, float]], List[str]]:
+        """
+        `search_by_text` for async callers: the query is embedded with the
+        async client (or served from the query-embedding LRU) and scoring
+        runs in a worker thread, so the event loop is never blocked.
+        """
+        self._check_query(mode, where)
+        query_vector = None
+        if mode != "lexical":
+            embedding_model = embedding_model or EmbeddingModel()
+            query_vector = np.array(await embedding_model.async_get_query_embedding(query_text, api_key=api_key))
+        results = await asyncio.to_thread(
+            self._search_text, query_text, query_vector, k, distance_measure, where, mode
+        )
+        return [result[0] for result in results] if return_as_text else results
+
+    @staticmethod
+    def _check_query(mode: str, where: Optional[Dict[str, Any]]) -> None:
+        """Rejects a bad mode or filter before the query is embedded."""
+        if mode not in ("vector", "lexical", "hybrid", "mmr"):
+            raise ValueError(f"Unknown search mode: {mode}")
+        if where is not None:
+            validate_where(where)
+
+    def _search_text(
+        self,
+        query_text: str,
+        query_vector: Optional[np.ndarray],
+        k: int,
+        distance_measure: Union[Callable, str, Metric],
+        where: Optional[Dict[str, Any]],
+        mode: str,
+    ) -> List[Tuple[str, float]]:
+        if mode == "lexical":
+            return self.search_lexical(query_text, k, where)
+        if mode == "hybrid":
+            return self._hybrid_search(query_text, query_vector, k, where)
+        if mode == "mmr":
+            return self.search_mmr(query_vector, k, where=where)
+        return self.search(query_vector, k, distance_measure, where=where)
+
+    def search_many(
+        self,
+        query_vectors: np.ndarray,
+        k: int,
+        distance_measure: Union[Callable, str, Metric] = cosine_similarity,
+        batch_size: int = 256,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Top-k search for several queries at once.
+
+        Cosine queries are handed to the index in batches of `batch_size`;
+        with the exact index that is one matrix-matrix product per batch,
+        which bounds the (batch, len(self)) score matrix. Other registered
+        metrics score every live row exactly, bypassing the index; results
+        are ordered best first, i.e. ascending for distances.
+        """
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+        if query_vectors.ndim == 1:
+            query_vectors = query_vectors.reshape(1, -1)
+        metric = get_metric(distance_measure)
+        if metric is None:
+            return [self.search(query, k, distance_measure, where=where) for query in query_vectors]
+        if len(self) == 0:
+            return [[] for _ in query_vectors]
+        results = []
+        for start in range(0, len(query_vectors), batch_size):
+            batch = query_vectors[start : start + batch_size]
+            if metric is METRICS["cosine"]:
+                rows, scores = self._search_rows(_normalize(batch)[0], k, where)
+            else:
+                rows, scores = self._metric_search_rows(metric, batch, k, where)
+            results.extend(self._results(r, s) for r, s in zip(rows, scores))
+        return results
+
+    def search_many_by_text(
+        self,
+        query_texts: List[str],
+        k: int,
+        distance_measure: Union[Callable, str, Metric] = cosine_similarity,
+        return_as_text: bool = False,
+        api_key: Optional[str] = None,
+        where: Optional[Dict[str, Any]] = None,
+        mode: str = "vector",
+        embedding_model: Optional[EmbeddingModel] = None,
+    ) -> Union[List[List[Tuple[str, float]]], List[List[str]]]:
+        """
+        Embeds all queries in a single request and searches them as one
+        batch; `mode` is as for `search_by_text`.
+        """
+        if not query_texts:
+            return []
+        self._check_query(mode, where)
+        if mode == "lexical":
+            results = [self.search_lexical(query_text, k, where) for query_text in query_texts]
+        else:
+            embedding_model = embedding_model or EmbeddingModel()
+            query_vectors = np.array(embedding_model.get_embeddings(query_texts, api_key=api_key))
+            if mode == "hybrid":
+                results = [
+                    self._hybrid_search(query_text, query_vector, k, where)
+                    for query_text, query_vector in zip(query_texts, query_vectors)
+                ]
+            elif mode == "mmr":
+                results = self.search_many_mmr(query_vectors, k, where=where)
+            else:
+                results = self.search_many(query_vectors, k, distance_measure, where=where)
+        if return_as_text:
+            return [[result[0] for result in query_results] for query_results in results]
+        return results
+
     def retrieve_from_key(self, key: str) -> Optional[np.ndarray]:
-        # Returns None if key is missing
-        return self.vectors.get(key, None)
+        # Returns None if key is missing (the most recent row if added more than once)
+        key_ids = self._key_to_ids.get(key)
+        return None if not key_ids else self.retrieve(key_ids[-1])
 
     def clear(self) -> None:
         """Remove all vectors from the database."""
-        self.vectors.clear()
+        self._reset_rows()
+        self.storage.clear()
+        self.index.reset()
+        self.mutations += 1
 
-    async def abuild_from_list(self, list_of_text: List[str], api_key: Optional[str] = None) -> "VectorDatabase":
-        embedding_model = EmbeddingModel()
+    def save(self, path: str) -> None:
+        """
+        Writes a snapshot directory that `load` can memory-map.
+
+        Layout: raw row-major arrays written by the storage (`vectors.f32`
+        with the normalized rows for float32 storage, `codes.<storage>` and
+        `quantizer.npz` for quantized ones), `norms.f32` (float32 per row),
+        the metadata columns and posting lists (`metadata.*`), the BM25
+        postings when lexical search is on (`lexical.*`) and `index.json`
+        (keys, ids, shape, storage type and its constructor settings).
+        Tombstones are compacted away first.
+        """
+        self.compact()
+        os.makedirs(path, exist_ok=True)
+        self.storage.save(path)
+        self.metadata.save(path)
+        if self.lexical is not None:
+            self.lexical.save(path)
+        header = {
+            "version": self._snapshot_version,
+            "storage": self.storage.name,
+            "storage_kwargs": self.storage._init_kwargs(),
+            "rescore_factor": self.storage.rescore_factor,
+            "dim": self.dim,
+            "count": len(self),
+            "keys": self._keys,
+            "ids": self._ids,
+            "next_id": self._next_id,
+            "lexical": self.lexical_enabled,
+        }
+        # Write the header last and atomically so a torn save is never loadable.
+        tmp_path = os.path.join(path, "index.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(header, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, os.path.join(path, "index.json"))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, index=None) -> "VectorDatabase":
+        """
+        Opens a snapshot written by `save`.
+
+        With `mmap=True` the arrays are mapped copy-on-write instead of read
+        onto the heap, so opening is O(keys) regardless of index size; pages
+        are faulted in by the first searches and any later insert that needs
+        to grow the storage copies it into memory. The metadata and BM25
+        postings are read back as arrays rather than rebuilt row by row
+        (snapshots from before they were saved are still rebuilt). ANN index
+        structures are not part of the snapshot; an approximate `index` is
+        retrained lazily.
+        """
+        with open(os.path.join(path, "index.json"), "r", encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get("version") != cls._snapshot_version:
+            raise ValueError(f"Unsupported snapshot version: {header.get('version')}")
+        storage = STORAGES[header.get("storage", Float32Storage.name)](**header.get("storage_kwargs", {}))
+        if "storage_kwargs" not in header:
+            storage.rescore_factor = header.get("rescore_factor", 0)
+        vector_db = cls(index=index, storage=storage, lexical=header.get("lexical", False))
+        if header["count"] == 0:
+            return vector_db
+        storage.load(path, header["count"], header["dim"], mmap)
+        vector_db._keys = list(header["keys"])
+        vector_db._ids = list(header.get("ids", range(header["count"])))
+        vector_db._next_id = header.get("next_id", header["count"])
+        vector_db._id_to_row = {id_: row for row, id_ in enumerate(vector_db._ids)}
+        for key, id_ in zip(vector_db._keys, vector_db._ids):
+            vector_db._key_to_ids.setdefault(key, []).append(id_)
+        if not vector_db.metadata.load(path, mmap):
+            columns = header.get("metadata", {})
+            vector_db.metadata.append(
+                [{field: column[row] for field, column in columns.items()} for row in range(header["count"])]
+            )
+        if vector_db.lexical is not None and not vector_db.lexical.load(path, mmap):
+            vector_db.lexical.append(vector_db._keys)
+        return vector_db
+
+    async def aadd_texts(
+        self,
+        list_of_text: List[str],
+        api_key: Optional[str] = None,
+        metadata: Optional[List[Optional[Dict[str, Any]]]] = None,
+        embedding_model: Optional[EmbeddingModel] = None,
+    ) -> np.ndarray:
+        """Embeds and appends texts, returning their ids (e.g. to delete a document later)."""
+        embedding_model = embedding_model or EmbeddingModel()
         embeddings = await embedding_model.async_get_embeddings(list_of_text, api_key=api_key)
-        for text, embedding in zip(list_of_text, embeddings):
-            self.insert(text, np.array(embedding))
+        if not embeddings:
+            return np.empty(0, dtype=np.int64)
+        return self.add_many(list(list_of_text), np.array(embeddings, dtype=np.float32), metadata)
+
+    async def aadd_text_stream(
+        self,
+        chunks: Iterable[str],
+        api_key: Optional[str] = None,
+        batch_size: int = 256,
+        embedding_model: Optional[EmbeddingModel] = None,
+    ) -> np.ndarray:
+        """
+        Embeds and appends a (possibly lazy) stream of texts, e.g. from
+        `text_utils.iter_chunk_text`, `batch_size` at a time, so only one
+        batch of chunks is held in memory. Returns the new ids.
+        """
+        embedding_model = embedding_model or EmbeddingModel()
+        ids = [
+            await self.aadd_texts(batch, api_key=api_key, embedding_model=embedding_model)
+            for batch in batched(chunks, batch_size)
+        ]
+        return np.concatenate(ids) if ids else np.empty(0, dtype=np.int64)
+
+    async def abuild_from_list(
+        self,
+        list_of_text: List[str],
+        api_key: Optional[str] = None,
+        metadata: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ) -> "VectorDatabase":
+        await self.aadd_texts(list_of_text, api_key=api_key, metadata=metadata)
         return self
 
 
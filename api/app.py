@@ -9,14 +9,32 @@ from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 # Import Pydantic for data validation and settings management
 from pydantic import BaseModel
-# Import OpenAI client for interacting with OpenAI's API
-from openai import OpenAI
 import os
-from typing import Optional, List
+from typing import Optional, List, Dict, Any, IO, Iterable, Literal, Tuple
 from aimakerspace.vectordatabase import VectorDatabase
+from aimakerspace.collection_cache import CollectionCache
+from aimakerspace.metadata import validate_where
+from aimakerspace.dedup import ChunkDeduplicator
+from aimakerspace.storage import PrefixStorage
 from aimakerspace.openai_utils.chatmodel import ChatOpenAI
-from aimakerspace.text_utils import chunk_text
+from aimakerspace.openai_utils.client_pool import default_client_pool
+from aimakerspace.openai_utils.embedding import EmbeddingModel
+from aimakerspace.openai_utils.embedding_cache import default_embedding_cache, query_embedding_lru
+from aimakerspace.text_utils import (
+    TokenTextSplitter,
+    batched,
+    chunk_text_with_offsets,
+    iter_csv_chunks,
+    iter_csv_lines,
+    iter_pdf_pages,
+    pdf_executor,
+)
 import asyncio
+import bisect
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+import hashlib
+import io
 import json
 import logging
 
@@ -24,8 +42,31 @@ import logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# One embedding model (environment, cache and backend resolved once) serves
+# every request. OpenAI clients are pooled per (api key, project) so
+# connections are reused across requests; close them all when the server
+# shuts down. PDF pages are extracted by one process pool shared by all
+# uploads; without it (e.g. where worker processes cannot be started) they
+# are extracted in the request's thread.
+embedding_model: Optional[EmbeddingModel] = None
+pdf_pool: Optional[ProcessPoolExecutor] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global embedding_model, pdf_pool
+    embedding_model = EmbeddingModel()
+    try:
+        pdf_pool = pdf_executor(PDF_EXTRACT_WORKERS or None)
+    except (OSError, ValueError) as e:
+        logger.warning(f"PDF extraction pool unavailable, extracting in-process: {e}")
+    yield
+    if pdf_pool is not None:
+        pdf_pool.shutdown(cancel_futures=True)
+        pdf_pool = None
+    await default_client_pool().aclose()
+
 # Initialize FastAPI application with a title
-app = FastAPI(title="OpenAI Chat API")
+app = FastAPI(title="OpenAI Chat API", lifespan=lifespan)
 
 # Configure CORS (Cross-Origin Resource Sharing) middleware
 # This allows the API to be accessed from different domains/origins
@@ -39,7 +80,6 @@ app.add_middleware(
 
 # Initialize our components (lazy initialization to avoid API key requirement at startup)
 chat_model = None
-vector_db = VectorDatabase()
 
 def get_chat_model():
     """Get or create the chat model instance."""
@@ -48,8 +88,68 @@ def get_chat_model():
         chat_model = ChatOpenAI(model_name="gpt-4-turbo-preview")
     return chat_model
 
-# Store uploaded documents in memory (in production, use a proper database)
-documents = {}
+# Optional directory for vector database snapshots. When set, every upload is
+# saved there and a query for a document that is not in memory (e.g. after a
+# restart, a serverless cold start or an eviction) memory-maps the snapshot
+# instead of asking the user to re-upload and re-embed.
+VECTOR_DB_DIR = os.getenv("VECTOR_DB_DIR")
+
+# Memory budget for the per-document vector databases kept in memory
+VECTOR_DB_MEMORY_BUDGET_MB = float(os.getenv("VECTOR_DB_MEMORY_BUDGET_MB", "512"))
+
+# Optional prefix length for a coarse first-pass scan: only the first N
+# dimensions of each chunk embedding are scanned, and the best candidates
+# are re-ranked with the full vectors (0 keeps exact full-dimension search)
+VECTOR_DB_PREFIX_DIM = int(os.getenv("VECTOR_DB_PREFIX_DIM", "0"))
+
+# Optional chunk budget in tokens: chunks are cut at exact token counts
+# (snapped to sentence ends) instead of ~1000 characters, so every chunk
+# fits embedding batches and the query prompt predictably (0 keeps
+# character-based chunking)
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "0"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+
+# PDF pages are extracted in a shared pool of this many worker processes
+# (0: one per CPU), PDFs under PDF_MIN_POOL_PAGES pages in-process; pages slower than PDF_SLOW_PAGE_SECONDS are logged as warnings
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0"))
+PDF_MIN_POOL_PAGES = int(os.getenv("PDF_MIN_POOL_PAGES", "8"))
+PDF_SLOW_PAGE_SECONDS = float(os.getenv("PDF_SLOW_PAGE_SECONDS", "1.0"))
+
+# Chunks at least this similar (estimated Jaccard over word 3-grams) to an
+# earlier chunk of the same upload are not embedded or stored again; the
+# kept chunk's metadata counts them in "duplicates" and their spans stay
+# matchable by page/row filters (default 1.0: exact duplicates only; lower
+# values opt in to dropping near duplicates, 0 keeps every chunk)
+CHUNK_DEDUP_THRESHOLD = float(os.getenv("CHUNK_DEDUP_THRESHOLD", "1.0"))
+
+# CSV uploads are chunked and embedded this many row-batch chunks at a time
+CSV_EMBED_BATCH_SIZE = int(os.getenv("CSV_EMBED_BATCH_SIZE", "256"))
+
+def snapshot_path(document_id: str) -> Optional[str]:
+    """Return the snapshot directory for a document, if snapshots are enabled."""
+    if not VECTOR_DB_DIR:
+        return None
+    return os.path.join(VECTOR_DB_DIR, document_id)
+
+def load_snapshot(document_id: str) -> Optional[VectorDatabase]:
+    """Restore a document's vector database from disk, or return None."""
+    path = snapshot_path(document_id)
+    if path is None or not os.path.exists(os.path.join(path, "index.json")):
+        return None
+    try:
+        vector_db = VectorDatabase.load(path, mmap=True)
+    except Exception as e:
+        logger.warning(f"Could not load snapshot for document {document_id}: {e}")
+        return None
+    logger.info(f"Loaded snapshot for document {document_id} ({len(vector_db)} vectors)")
+    return vector_db
+
+# One vector database per uploaded document, evicted least-recently-used
+# once the memory budget is exceeded
+collections = CollectionCache(
+    max_bytes=int(VECTOR_DB_MEMORY_BUDGET_MB * 1024 * 1024),
+    loader=load_snapshot,
+)
 
 # Define the data model for chat requests using Pydantic
 # This ensures incoming request data is properly validated
@@ -64,16 +164,98 @@ class QueryRequest(BaseModel):
     query: str
     document_id: str
     api_key: str  # OpenAI API key for authentication
+    where: Optional[Dict[str, Any]] = None  # Metadata filter, e.g. {"page": {"$gte": 3}}
+    mode: Optional[Literal["vector", "lexical", "hybrid", "mmr"]] = "vector"  # "hybrid" adds BM25, "lexical" makes no embedding call, "mmr" diversifies chunks
+
+def unit_starts(units: List[str], separator: str = "\n") -> List[int]:
+    """Character offset at which each unit (page, CSV row) starts once joined."""
+    starts = []
+    position = 0
+    for unit in units:
+        starts.append(position)
+        position += len(unit) + len(separator)
+    return starts
+
+def chunk_metadata(document_id: str, start: int, end: int, unit: Optional[str], unit_offsets: List[int]) -> Dict[str, Any]:
+    """Provenance of one chunk: document, character span and the pages/rows it covers."""
+    metadata = {"document_id": document_id, "char_start": start, "char_end": end}
+    if unit is not None:
+        metadata[f"{unit}_start"] = bisect.bisect_right(unit_offsets, start) - 1 + (unit == "page")
+        metadata[f"{unit}_end"] = bisect.bisect_right(unit_offsets, max(start, end - 1)) - 1 + (unit == "page")
+    return metadata
+
+def csv_document_digest(csv_file: IO[bytes]) -> Tuple[str, int]:
+    """
+    SHA-256 and length of the flattened CSV text (rows joined by newlines),
+    computed row by row without materializing it.
+    """
+    digest = hashlib.sha256()
+    length = 0
+    for i, line in enumerate(iter_csv_lines(csv_file)):
+        if i:
+            digest.update(b"\n")
+            length += 1
+        digest.update(line.encode("utf-8"))
+        length += len(line)
+    return digest.hexdigest(), length
+
+async def embed_chunks(
+    vector_db: VectorDatabase,
+    pairs: Iterable[Tuple[str, Dict[str, Any]]],
+    api_key: Optional[str],
+    batch_size: Optional[int] = None,
+) -> Tuple[int, Optional[Dict[str, Any]]]:
+    """
+    Embeds (chunk, metadata) pairs into `vector_db`, `batch_size` at a time
+    (all at once when None), skipping duplicate chunks when deduplication
+    is enabled; their provenance is kept as metadata aliases of the stored
+    chunk they duplicate. Returns the number of chunks stored and the dedup report.
+    """
+    dedup = ChunkDeduplicator(threshold=CHUNK_DEDUP_THRESHOLD) if CHUNK_DEDUP_THRESHOLD else None
+    stored_ids = {}  # chunk index -> id, for every stored chunk
+    dropped = {}  # chunk index -> metadata, for every duplicate that was not stored
+    batches = batched(enumerate(pairs), batch_size) if batch_size else [list(enumerate(pairs))]
+    for batch in batches:
+        kept = []
+        for i, (chunk, metadata) in batch:
+            if dedup is None or dedup.add(chunk) == i:
+                kept.append((i, chunk, metadata))
+            else:
+                dropped[i] = metadata
+        if not kept:
+            continue
+        ids = await vector_db.aadd_texts(
+            [chunk for _, chunk, _ in kept],
+            api_key=api_key,
+            metadata=[metadata for _, _, metadata in kept],
+            embedding_model=embedding_model,
+        )
+        stored_ids.update(zip((i for i, _, _ in kept), ids))
+    if dedup is None:
+        return len(stored_ids), None
+    for representative, members in dedup.groups().items():
+        if len(members) > 1:
+            id_ = stored_ids[representative]
+            vector_db.update_metadata(id_, {**vector_db.get_metadata(id_), "duplicates": len(members) - 1})
+            # The duplicates' spans stay searchable: page/row filters match them too
+            vector_db.add_metadata_aliases(id_, [dropped[member] for member in members[1:]])
+    return len(stored_ids), dedup.stats()
+
+def extraction_report(page_seconds: List[float], slowest: int = 5) -> Dict[str, Any]:
+    """Summary of per-page PDF extraction times for the upload response."""
+    ranked = sorted(range(len(page_seconds)), key=lambda i: page_seconds[i], reverse=True)[:slowest]
+    return {
+        "pages": len(page_seconds),
+        "seconds": round(sum(page_seconds), 3),
+        "slowest_pages": [{"page": i + 1, "seconds": round(page_seconds[i], 3)} for i in ranked],
+    }
 
 # Define the main chat endpoint that handles POST requests
 @app.post("/api/chat")
 async def chat(request: ChatRequest):
     try:
-        # Initialize OpenAI client with the provided API key
-        client = OpenAI(
-            api_key=request.api_key,
-            project=request.project_id,
-        )
+        # Reuse the pooled OpenAI client for this API key and project
+        client = default_client_pool().client(request.api_key, request.project_id)
         
         # Create an async generator function for streaming responses
         async def generate():
@@ -117,7 +299,7 @@ async def upload_file(file: UploadFile = File(...), openai_api_key: str = Form(N
                 )
         
         # Read file content in chunks to handle large files
-        content = b""
+        content = bytearray()  # grows in place; `bytes +=` would copy the whole upload per block
         chunk_size = 1024 * 1024  # 1MB chunks
         total_size = 0
         chunk_count = 0
@@ -155,15 +337,36 @@ async def upload_file(file: UploadFile = File(...), openai_api_key: str = Form(N
         try:
             logger.info("Attempting to decode file content or extract from PDF/CSV...")
             text_content = None
+            # Pages (1-based) or CSV rows (0-based, header included) are
+            # recorded per chunk so queries can filter on them
+            unit = None
+            unit_offsets = []
+            page_seconds = []
+            csv_digest = None
             if file.content_type == "application/pdf" or (file.filename and file.filename.lower().endswith(".pdf")):
-                from PyPDF2 import PdfReader
-                import io
-                pdf_stream = io.BytesIO(content)
-                reader = PdfReader(pdf_stream)
+                # Pages are extracted by the shared pool (in-process for short
+                # documents) and arrive in order; each one is awaited off the
+                # event loop
+                pages = await asyncio.to_thread(
+                    iter_pdf_pages,
+                    content,
+                    max_workers=(PDF_EXTRACT_WORKERS or None) if pdf_pool is not None else 1,
+                    executor=pdf_pool,
+                    min_pool_pages=PDF_MIN_POOL_PAGES,
+                )
                 extracted_text = []
-                for page in reader.pages:
-                    extracted_text.append(page.extract_text() or "")
-                text_content = "\n".join(extracted_text).strip()
+                while (page := await asyncio.to_thread(next, pages, None)) is not None:
+                    page_number, page_text, seconds = page
+                    extracted_text.append(page_text)
+                    page_seconds.append(seconds)
+                    logger.debug(f"Extracted page {page_number} in {seconds * 1000:.1f} ms")
+                    if seconds > PDF_SLOW_PAGE_SECONDS:
+                        logger.warning(f"Slow PDF page {page_number}: {seconds:.2f} s to extract text")
+                joined_text = "\n".join(extracted_text)
+                text_content = joined_text.strip()
+                lead = len(joined_text) - len(joined_text.lstrip())
+                unit = "page"
+                unit_offsets = [offset - lead for offset in unit_starts(extracted_text)]
                 if not text_content:
                     logger.error("No extractable text found in PDF.")
                     raise HTTPException(
@@ -171,14 +374,12 @@ async def upload_file(file: UploadFile = File(...), openai_api_key: str = Form(N
                         detail="No extractable text found in PDF. Please upload a text-based PDF."
                     )
             elif file.content_type in ["text/csv", "application/csv"] or (file.filename and file.filename.lower().endswith(".csv")):
-                import csv
-                import io
-                csv_stream = io.StringIO(content.decode("utf-8"))
-                reader = csv.reader(csv_stream)
-                rows = list(reader)
-                # Flatten CSV rows into a string for chunking
-                text_content = "\n".join([", ".join(row) for row in rows])
-                if not text_content:
+                # Rows are streamed from one buffer over the upload bytes
+                # instead of being materialized: here for the document ID,
+                # then again below (after rewinding) as row-batch chunks
+                csv_buffer = io.BytesIO(content)
+                csv_digest, csv_length = csv_document_digest(csv_buffer)
+                if not csv_length:
                     logger.error("No extractable text found in CSV.")
                     raise HTTPException(
                         status_code=400,
@@ -198,7 +399,8 @@ async def upload_file(file: UploadFile = File(...), openai_api_key: str = Form(N
                             status_code=400,
                             detail=".txt file could not be decoded as UTF-8 or Latin-1. Please check file encoding."
                         )
-            logger.info(f"Successfully obtained file content, length: {len(text_content)} characters")
+            length = csv_length if csv_digest is not None else len(text_content)
+            logger.info(f"Successfully obtained file content, length: {length} characters")
         except Exception as e:
             logger.error(f"Failed to decode or extract file content: {str(e)}")
             raise HTTPException(
@@ -206,29 +408,49 @@ async def upload_file(file: UploadFile = File(...), openai_api_key: str = Form(N
                 detail="File must be a valid text document or a text-based PDF. PDF files with only images are not supported."
             )
         
-        # Generate a simple document ID (in production, use UUID)
-        document_id = str(hash(text_content))
+        # Derive the document ID from the content so re-uploads of the same
+        # file reuse the collection that is already in memory or on disk
+        document_id = (csv_digest or hashlib.sha256(text_content.encode("utf-8")).hexdigest())[:32]
         logger.info(f"Generated document ID: {document_id}")
-        
-        # Delete previous document/context before ingesting new one
-        if documents:
-            logger.info(f"Deleting previous document(s): {list(documents.keys())}")
-            documents.clear()
-            try:
-                vector_db.clear()  # Assuming VectorDatabase has a clear() method
-                logger.info("Cleared vector database context.")
-            except Exception as e:
-                logger.warning(f"Could not clear vector database: {e}")
+
+        # A miss may load a snapshot from disk, so keep it off the event loop
+        existing = await asyncio.to_thread(collections.get, document_id)
+        if existing is not None:
+            logger.info(f"Document {document_id} already ingested, skipping embedding")
+            return {"document_id": document_id, "chunk_count": len(existing)}
         
         # Chunk the text into smaller segments
         logger.info("Creating text chunks...")
-        chunks = chunk_text(text_content)
-        logger.info(f"Created {len(chunks)} text chunks")
+        if csv_digest is not None:
+            # Whole rows per chunk with the header repeated, chunked and
+            # embedded one batch at a time
+            csv_buffer.seek(0)
+            spans = iter_csv_chunks(iter_csv_lines(csv_buffer), max_tokens=CHUNK_TOKENS or None)
+            pairs = (
+                (chunk, {"document_id": document_id, "char_start": start, "char_end": end, "row_start": first, "row_end": last})
+                for chunk, start, end, first, last in spans
+            )
+            batch_size = CSV_EMBED_BATCH_SIZE
+        else:
+            if CHUNK_TOKENS:
+                spans = TokenTextSplitter(CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS).split_with_offsets(text_content)
+            else:
+                spans = chunk_text_with_offsets(text_content)
+            pairs = [(chunk, chunk_metadata(document_id, start, end, unit, unit_offsets)) for chunk, start, end in spans]
+            logger.info(f"Created {len(pairs)} text chunks")
+            batch_size = None
         
         # Create embeddings and store in vector database
         try:
             logger.info("Storing embeddings in vector database...")
-            await vector_db.abuild_from_list(chunks, api_key=openai_api_key)
+            storage = PrefixStorage(prefix_dim=VECTOR_DB_PREFIX_DIM) if VECTOR_DB_PREFIX_DIM else None
+            vector_db = VectorDatabase(storage=storage, lexical=True)
+            chunk_count, dedup_stats = await embed_chunks(vector_db, pairs, openai_api_key, batch_size)
+            if dedup_stats is not None:
+                logger.info(
+                    f"Stored {chunk_count} of {dedup_stats['chunks']} chunks: {dedup_stats['embeddings_saved']} "
+                    f"embeddings and {dedup_stats['bytes_saved']} bytes saved by deduplication"
+                )
             logger.info("Successfully stored embeddings in vector database")
         except Exception as e:
             import traceback
@@ -240,11 +462,26 @@ async def upload_file(file: UploadFile = File(...), openai_api_key: str = Form(N
                 detail=f"Failed to process document: {type(e).__name__}: {str(e)}\n{tb}"
             )
         
-        # Store the original chunks for reference
-        documents[document_id] = chunks
+        path = snapshot_path(document_id)
+        if path is not None:
+            try:
+                await asyncio.to_thread(vector_db.save, path)
+                logger.info(f"Saved vector database snapshot to {path}")
+                # Serve the memory-mapped snapshot: full-dimension rows kept
+                # for rescoring then stay on disk instead of on the heap
+                vector_db = await asyncio.to_thread(VectorDatabase.load, path, True)
+            except Exception as e:
+                logger.warning(f"Could not save vector database snapshot: {e}")
+
+        collections.put(document_id, vector_db)
         
         logger.info(f"Upload completed successfully. Document ID: {document_id}")
-        return {"document_id": document_id, "chunk_count": len(chunks)}
+        response = {"document_id": document_id, "chunk_count": chunk_count}
+        if page_seconds:
+            response["extraction"] = extraction_report(page_seconds)
+        if dedup_stats is not None:
+            response["dedup"] = dedup_stats
+        return response
         
     except HTTPException as e:
         logger.error(f"HTTP error in upload: {e.status_code} - {e.detail}")
@@ -261,17 +498,27 @@ async def query_document(request: QueryRequest):
     try:
         logger.info(f"Received query request for document {request.document_id}")
         
-        if request.document_id not in documents:
+        vector_db = await asyncio.to_thread(collections.get, request.document_id)
+        if vector_db is None:
             logger.warning(f"Document not found: {request.document_id}")
             raise HTTPException(status_code=404, detail="Document not found")
         
+        if request.where is not None:
+            try:
+                validate_where(request.where)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid filter: {e}")
+        
         # Search for relevant chunks
         try:
-            relevant_chunks = vector_db.search_by_text(
+            relevant_chunks = await vector_db.asearch_by_text(
                 request.query,
                 k=3,  # Get top 3 most relevant chunks
                 return_as_text=True,
-                api_key=request.api_key  # Pass the API key for embedding search
+                api_key=request.api_key,  # Pass the API key for embedding search
+                where=request.where,  # Only score chunks matching the metadata filter
+                mode=request.mode or "vector",
+                embedding_model=embedding_model,
             )
             logger.info(f"Found {len(relevant_chunks)} relevant chunks")
             logger.debug(f"Chunks: {relevant_chunks}")
@@ -299,18 +546,18 @@ async def query_document(request: QueryRequest):
         # Stream the response
         async def generate_response():
             try:
-                # Initialize OpenAI client with the provided API key
-                client = OpenAI(api_key=request.api_key)
+                # Reuse the pooled async OpenAI client so streaming never blocks the event loop
+                client = default_client_pool().async_client(request.api_key)
                 
                 # Create a streaming chat completion request
-                stream = client.chat.completions.create(
+                stream = await client.chat.completions.create(
                     model="gpt-4.1-mini",
                     messages=messages,
                     stream=True
                 )
                 
                 # Yield each chunk of the response as it becomes available
-                for chunk in stream:
+                async for chunk in stream:
                     if chunk.choices[0].delta.content is not None:
                         yield f"data: {json.dumps({'token': chunk.choices[0].delta.content})}\n\n"
                 yield "data: [DONE]\n\n"
@@ -328,6 +575,17 @@ async def query_document(request: QueryRequest):
         logger.error(f"Unexpected error handling query: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+# Report resident memory and hit/miss counts of the document collections
+@app.get("/api/stats")
+async def collection_stats():
+    embedding_cache = default_embedding_cache()
+    return {
+        **collections.stats(),
+        "embedding_cache": embedding_cache.stats() if embedding_cache is not None else None,
+        "openai_clients": default_client_pool().stats(),
+        "query_embeddings": query_embedding_lru().stats(),
+    }
+
 # Define a health check endpoint to verify API status
 @app.get("/api/health")
 async def health_check():
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+chunk_text against the original implementation: `re.sub` normalization
+plus four `rfind` scans per chunk, reproduced below as the reference.
+Both must return identical chunks; the script checks before timing.
+
+    python benchmarks/bench_chunking.py --chars 20000000
+    python benchmarks/bench_chunking.py --from-file book.txt --repeat 20
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aimakerspace.text_utils import chunk_text
+
+
+def reference_chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200):
+    text = re.sub(r"\s+", " ", text.strip())
+    if len(text) <= chunk_size:
+        return [text]
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + chunk_size
+        if end >= len(text):
+            chunks.append(text[start:])
+            break
+        sentence_end = max(
+            text.rfind(".", end - 200, end), text.rfind("?", end - 200, end), text.rfind("!", end - 200, end)
+        )
+        if sentence_end > start:
+            end = sentence_end + 1
+        else:
+            last_space = text.rfind(" ", end - 200, end)
+            if last_space > start:
+                end = last_space
+        chunks.append(text[start:end].strip())
+        start = end - overlap
+    return chunks
+
+
+def synthetic(chars: int, rng) -> str:
+    words = ["the", "model", "retrieval", "of", "vector", "a", "chunk", "embedding", "query", "and", "index"]
+    endings = [". ", "? ", "! ", ".\n\n", ", ", " ", " ", "\n"]
+    parts, length = [], 0
+    while length < chars:
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(4, 30)))
+        part = sentence + rng.choice(endings)
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)[:chars]
+
+
+def timed(fn, text, args):
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        chunks = fn(text, args.chunk_size, args.overlap)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chars", type=int, default=20_000_000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per implementation; the best is reported")
+    parser.add_argument("--from-file", help="chunk this text file instead of synthetic prose")
+    args = parser.parse_args()
+
+    if args.from_file:
+        with open(args.from_file, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = synthetic(args.chars, random.Random(0))
+
+    reference_ms, expected = timed(reference_chunk_text, text, args)
+    current_ms, chunks = timed(chunk_text, text, args)
+    if chunks != expected:
+        sys.exit("chunk_text output differs from the reference implementation")
+
+    mb = len(text.encode("utf-8")) / 1e6
+    print(f"{mb:.1f} MB -> {len(chunks)} chunks (chunk_size={args.chunk_size}, overlap={args.overlap})")
+    print(f"{'implementation':<12} {'ms':>9} {'MB/s':>8}")
+    print(f"{'reference':<12} {reference_ms:9.1f} {mb / reference_ms * 1000:8.1f}")
+    print(f"{'chunk_text':<12} {current_ms:9.1f} {mb / current_ms * 1000:8.1f}  ({reference_ms / current_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Cost of serving a re-upload from the SQLite embedding cache: batched
+insert and lookup of N chunk embeddings (1536-d), no API involved.
+
+    python benchmarks/bench_embedding_cache.py --chunks 10000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aimakerspace.openai_utils.embedding_cache import EmbeddingCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=1536)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    texts = [f"chunk {i} " + "lorem ipsum " * 40 for i in range(args.chunks)]
+    vectors = rng.standard_normal((args.chunks, args.dim), dtype=np.float32)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = EmbeddingCache(os.path.join(directory, "embeddings.sqlite3"))
+        start = time.perf_counter()
+        cache.put_many("text-embedding-3-small", texts, vectors)
+        put_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cached = cache.get_many("text-embedding-3-small", texts)
+        get_seconds = time.perf_counter() - start
+        assert all(vector is not None for vector in cached)
+        cache.close()
+
+    print(f"chunks={args.chunks} dim={args.dim}")
+    print(f"put_many : {put_seconds * 1000:8.1f} ms ({args.chunks / put_seconds:9.0f} chunks/s)")
+    print(f"get_many : {get_seconds * 1000:8.1f} ms ({args.chunks / get_seconds:9.0f} chunks/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Ingest wall time of EmbeddingModel.async_get_embeddings as a function of
+max_concurrency, against a simulated embeddings endpoint (fixed latency
+plus a per-token cost, and a 429 on a fraction of requests) so it runs
+offline and reproducibly. Point it at real traffic by removing the stub.
+
+    python benchmarks/bench_embedding_concurrency.py --chunks 2000 --concurrency 1 2 4 8 16
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import openai
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aimakerspace.openai_utils.embedding import EmbeddingModel, estimate_tokens
+
+
+class SimulatedRateLimit(openai.RateLimitError):
+    def __init__(self):
+        Exception.__init__(self, "rate limited (simulated)")
+        self.response = None
+
+
+class SimulatedEmbeddings:
+    def __init__(self, latency: float, seconds_per_token: float, rate_limit_probability: float, seed: int = 0):
+        self.latency = latency
+        self.seconds_per_token = seconds_per_token
+        self.rate_limit_probability = rate_limit_probability
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.rate_limited = 0
+
+    async def create(self, input, model):
+        self.requests += 1
+        tokens = sum(estimate_tokens(text) for text in input)
+        await asyncio.sleep(self.latency + tokens * self.seconds_per_token)
+        if self.random.random() < self.rate_limit_probability:
+            self.rate_limited += 1
+            raise SimulatedRateLimit()
+        data = [type("Embedding", (), {"embedding": [float(len(text))]}) for text in input]
+        return type("Response", (), {"data": data})
+
+
+class SimulatedClient:
+    def __init__(self, embeddings: SimulatedEmbeddings):
+        self.embeddings = embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--batch-tokens", type=int, default=20_000)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per request")
+    parser.add_argument("--seconds-per-token", type=float, default=2e-6)
+    parser.add_argument("--rate-limit-probability", type=float, default=0.15)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    texts = [f"chunk {i} " + "x" * args.chunk_chars for i in range(args.chunks)]
+    print(f"chunks={args.chunks} chars/chunk={args.chunk_chars} batch_tokens={args.batch_tokens}")
+    for concurrency in args.concurrency:
+        embeddings = SimulatedEmbeddings(args.latency, args.seconds_per_token, args.rate_limit_probability)
+        model = EmbeddingModel(max_batch_tokens=args.batch_tokens, max_concurrency=concurrency, backoff_base=0.2)
+        model.cache = None
+        model._get_async_client = lambda api_key=None: SimulatedClient(embeddings)
+        start = time.perf_counter()
+        vectors = asyncio.run(model.async_get_embeddings(texts))
+        seconds = time.perf_counter() - start
+        assert [vector[0] for vector in vectors] == [float(len(text)) for text in texts]
+        print(
+            f"concurrency={concurrency:<3} {seconds:6.2f} s "
+            f"({embeddings.requests} requests, {embeddings.rate_limited} rate-limited)"
+        )
+
+
+if __name__ == "__main__":
+    main()
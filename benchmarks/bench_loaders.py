@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Files/sec of TextFileLoader / PDFLoader `iter_documents` over a generated
+directory, reading in-process (max_workers=1, what load_directory used to
+do) and in process pools of increasing size. Peak parent RSS shows the
+bounded in-flight window at work.
+
+    python benchmarks/bench_loaders.py --text-files 2000 --pdf-files 200 --workers 1 2 4
+"""
+
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aimakerspace.text_utils import PDFLoader, TextFileLoader
+
+
+def write_pdf(path: str, pages, rng) -> None:
+    """Minimal text PDF: one Helvetica content stream per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        stream = "BT /F1 10 Tf 12 TL 40 780 Td " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def sentence(rng) -> str:
+    words = ["the", "retrieval", "model", "of", "a", "vector", "embedding", "and", "query", "index"]
+    return " ".join(rng.choice(words) for _ in range(rng.randint(5, 12))).capitalize() + "."
+
+
+def build(directory: str, text_files: int, pdf_files: int, text_kb: int, pdf_pages: int, rng) -> None:
+    for i in range(text_files):
+        with open(os.path.join(directory, f"doc-{i}.txt"), "w") as f:
+            parts, size = [], 0
+            while size < text_kb * 1024:
+                parts.append(sentence(rng))
+                size += len(parts[-1]) + 1
+            f.write(" ".join(parts))
+    for i in range(pdf_files):
+        pages = [[sentence(rng) for _ in range(40)] for _ in range(pdf_pages)]
+        write_pdf(os.path.join(directory, f"doc-{i}.pdf"), pages, rng)
+    # One unreadable file of each kind: reported per file, the run goes on
+    with open(os.path.join(directory, "broken.txt"), "wb") as f:
+        f.write(b"\xff\xfe not utf-8 \xff")
+    with open(os.path.join(directory, "broken.pdf"), "wb") as f:
+        f.write(b"not a pdf")
+
+
+def run(loader, workers: int):
+    start = time.perf_counter()
+    files = errors = chars = 0
+    for _, text, error in loader.iter_documents(max_workers=workers):
+        files += 1
+        if error is not None:
+            errors += 1
+        else:
+            chars += len(text)
+    return files, errors, chars, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--text-files", type=int, default=2000)
+    parser.add_argument("--text-kb", type=int, default=32)
+    parser.add_argument("--pdf-files", type=int, default=200)
+    parser.add_argument("--pdf-pages", type=int, default=10)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        build(directory, args.text_files, args.pdf_files, args.text_kb, args.pdf_pages, random.Random(0))
+        print(f"cpus={os.cpu_count()} text={args.text_files} x {args.text_kb} KB, pdf={args.pdf_files} x {args.pdf_pages} pages")
+        print(f"{'loader':<15} {'workers':>7} {'files':>6} {'errors':>6} {'files/s':>9} {'MB/s':>7}")
+        for name, loader in (("TextFileLoader", TextFileLoader(directory)), ("PDFLoader", PDFLoader(directory))):
+            for workers in args.workers:
+                files, errors, chars, seconds = run(loader, workers)
+                print(
+                    f"{name:<15} {workers:7d} {files:6d} {errors:6d} {files / seconds:9.0f} "
+                    f"{chars / seconds / 1e6:7.1f}"
+                )
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"peak parent RSS: {peak_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
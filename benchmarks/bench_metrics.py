@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Latency of the registered (vectorized) metrics against the equivalent
+pairwise Python callables, which VectorDatabase.search applies row by row.
+
+    python benchmarks/bench_metrics.py --rows 20000 --queries 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aimakerspace.vectordatabase import VectorDatabase, cosine_similarity
+
+PAIRWISE = {
+    "cosine": cosine_similarity,
+    "dot": lambda a, b: float(np.dot(a, b)),
+    "neg_l2": lambda a, b: -float(np.linalg.norm(a - b)),
+    # Pairwise callables are always ranked highest first, so negate the distance.
+    "manhattan": lambda a, b: -float(np.abs(a - b).sum()),
+}
+
+
+def timed(search, queries):
+    start = time.perf_counter()
+    results = [search(query) for query in queries]
+    return (time.perf_counter() - start) * 1000 / len(queries), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vector_db = VectorDatabase()
+    vector_db.add_many(
+        [f"chunk-{i}" for i in range(args.rows)],
+        rng.standard_normal((args.rows, args.dim), dtype=np.float32),
+    )
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+    print(f"rows={args.rows} dim={args.dim} queries={args.queries} k={args.k}")
+    print(f"{'metric':<10} {'pairwise ms':>12} {'vectorized ms':>14} {'speedup':>8}")
+    for name, pairwise in PAIRWISE.items():
+        slow_ms, slow = timed(lambda q: vector_db.search(q, args.k, lambda a, b: pairwise(a, b)), queries)
+        fast_ms, fast = timed(lambda q: vector_db.search(q, args.k, name), queries)
+        assert [[key for key, _ in r] for r in slow] == [[key for key, _ in r] for r in fast]
+        print(f"{name:<10} {slow_ms:12.1f} {fast_ms:14.1f} {slow_ms / fast_ms:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+PDF extraction inside an async handler: the previous inline loop over
+`page.extract_text()` against `iter_pdf_pages` awaited page by page with
+`asyncio.to_thread`, with a pool started per call or with one shared,
+already warm `pdf_executor` pool as /api/upload does now. A ticker
+coroutine measures how long the event loop is stalled while each runs.
+
+    python benchmarks/bench_pdf_pages.py --pages 300 --workers 1 2 4
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyPDF2 import PdfReader
+
+from aimakerspace.text_utils import iter_pdf_pages, pdf_executor
+from bench_loaders import sentence, write_pdf
+
+
+async def inline(data: bytes, workers: int, executor=None):
+    return [(i + 1, page.extract_text() or "", 0.0) for i, page in enumerate(PdfReader(io.BytesIO(data)).pages)]
+
+
+async def pooled(data: bytes, workers: int, executor=None):
+    pages = await asyncio.to_thread(iter_pdf_pages, data, workers, executor=executor)
+    results = []
+    while (page := await asyncio.to_thread(next, pages, None)) is not None:
+        results.append(page)
+    return results
+
+
+async def measure(extract, data: bytes, workers: int, executor=None, tick: float = 0.005):
+    stalls = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            before = time.perf_counter()
+            await asyncio.sleep(tick)
+            stalls.append(time.perf_counter() - before - tick)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    pages = await extract(data, workers, executor)
+    seconds = time.perf_counter() - start
+    done.set()
+    await task
+    return pages, seconds, max(stalls, default=0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--lines", type=int, default=60, help="lines of text per page")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".bench_pages.pdf")
+    write_pdf(path, [[sentence(rng) for _ in range(args.lines)] for _ in range(args.pages)], rng)
+    with open(path, "rb") as f:
+        data = f.read()
+    os.remove(path)
+
+    expected, seconds, stall = asyncio.run(measure(inline, data, 1))
+    print(f"{args.pages} pages, {len(data) / 1e6:.1f} MB, cpus={os.cpu_count()}")
+    print(f"{'extraction':<22} {'total ms':>9} {'max loop stall ms':>18}")
+    print(f"{'inline (before)':<22} {seconds * 1000:9.0f} {stall * 1000:18.1f}")
+    for workers in args.workers:
+        pages, seconds, stall = asyncio.run(measure(pooled, data, workers))
+        if [text for _, text, _ in pages] != [text for _, text, _ in expected]:
+            sys.exit("iter_pdf_pages returned different page text")
+        print(f"{f'iter_pdf_pages x{workers}':<22} {seconds * 1000:9.0f} {stall * 1000:18.1f}")
+    workers = max(args.workers)
+    executor = pdf_executor(workers)
+    try:
+        asyncio.run(measure(pooled, data, workers, executor))  # start the workers
+        pages, seconds, stall = asyncio.run(measure(pooled, data, workers, executor))
+    finally:
+        executor.shutdown()
+    if [text for _, text, _ in pages] != [text for _, text, _ in expected]:
+        sys.exit("iter_pdf_pages returned different page text")
+    print(f"{f'shared pool x{workers}':<22} {seconds * 1000:9.0f} {stall * 1000:18.1f}")
+    slowest = sorted(pages, key=lambda page: page[2], reverse=True)[:3]
+    print("slowest pages:", ", ".join(f"{number} ({seconds * 1000:.1f} ms)" for number, _, seconds in slowest))
+
+
+if __name__ == "__main__":
+    main()
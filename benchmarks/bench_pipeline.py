@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+End-to-end ingest and query timings (chunking, embedding, indexing,
+asearch_by_text) with the local hashing embedding backend, so the real
+code paths run offline at a realistic vector size. Modes run in order, so
+only the "vector" pass embeds the queries; later ones hit the query LRU.
+
+    EMBEDDING_BACKEND=hashing EMBEDDING_DIM=1536 \\
+        python benchmarks/bench_pipeline.py --chars 2000000 --queries 200
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("EMBEDDING_BACKEND", "hashing")
+
+from aimakerspace.text_utils import chunk_text_with_offsets
+from aimakerspace.vectordatabase import VectorDatabase
+
+
+def synthetic_document(chars: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(5000)]
+    words = []
+    length = 0
+    while length < chars:
+        word = rng.choice(vocabulary) if rng.random() < 0.7 else rng.choice(vocabulary[:200])
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+async def run(args):
+    text = synthetic_document(args.chars)
+
+    start = time.perf_counter()
+    chunks = chunk_text_with_offsets(text)
+    chunk_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vector_db = await VectorDatabase(lexical=True).abuild_from_list([chunk for chunk, _, _ in chunks])
+    ingest_seconds = time.perf_counter() - start
+
+    queries = [" ".join(random.Random(i).sample(chunks[i % len(chunks)][0].split(), 8)) for i in range(args.queries)]
+    timings = {}
+    for mode in ("vector", "hybrid", "mmr"):
+        start = time.perf_counter()
+        for query in queries:
+            await vector_db.asearch_by_text(query, k=3, mode=mode)
+        timings[mode] = (time.perf_counter() - start) * 1000 / len(queries)
+
+    print(f"backend={os.environ['EMBEDDING_BACKEND']} dim={vector_db.dim} chars={args.chars} chunks={len(chunks)}")
+    print(f"chunking      : {chunk_seconds * 1000:8.1f} ms")
+    print(f"embed + index : {ingest_seconds * 1000:8.1f} ms ({len(chunks) / ingest_seconds:7.0f} chunks/s)")
+    for mode, ms in timings.items():
+        print(f"query {mode:<7} : {ms:8.2f} ms/query")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chars", type=int, default=2_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
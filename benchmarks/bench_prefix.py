@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Two-stage retrieval with PrefixStorage: scan a renormalized prefix of each
+embedding, then re-rank the top k * rescore_factor rows at full dimension.
+
+Matryoshka-trained embeddings (text-embedding-3-*) concentrate information
+in their leading dimensions; the synthetic vectors mimic that with a
+per-dimension scale that decays as 1 / (1 + i / decay). Re-run with real
+embeddings (--from-npy) before picking a prefix length.
+
+    python benchmarks/bench_prefix.py --rows 50000 --prefix 256 512 768
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aimakerspace.storage import PrefixStorage
+from aimakerspace.vectordatabase import VectorDatabase
+
+
+def synthetic(rows: int, dim: int, queries: int, decay: float, rng):
+    scale = (1 + np.arange(dim) / decay) ** -1
+    centers = rng.standard_normal((rows // 50, dim)) * scale
+    data = centers[rng.integers(len(centers), size=rows)] + 0.5 * rng.standard_normal((rows, dim)) * scale
+    picks = data[rng.integers(rows, size=queries)]
+    noisy = picks + 0.5 * rng.standard_normal((queries, dim)) * scale
+    return data.astype(np.float32), noisy.astype(np.float32)
+
+
+def timed_search(vector_db, queries, k):
+    vector_db.search_many(queries[:4], k)  # warm-up
+    start = time.perf_counter()
+    results = [vector_db.search(query, k) for query in queries]
+    return (time.perf_counter() - start) * 1000 / len(queries), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--decay", type=float, default=128.0)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--prefix", type=int, nargs="+", default=[256, 512, 768])
+    parser.add_argument("--from-npy", help="(rows, dim) float32 embeddings; queries are noisy copies of rows")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.from_npy:
+        data = np.load(args.from_npy).astype(np.float32)
+        queries = data[rng.integers(len(data), size=args.queries)]
+        queries = queries + 0.1 * queries.std() * rng.standard_normal(queries.shape).astype(np.float32)
+    else:
+        data, queries = synthetic(args.rows, args.dim, args.queries, args.decay, rng)
+    keys = [f"chunk-{i}" for i in range(len(data))]
+
+    exact = VectorDatabase()
+    exact.add_many(keys, data)
+    exact_ms, expected = timed_search(exact, queries, args.k)
+    expected = [{key for key, _ in result} for result in expected]
+
+    print(f"rows={len(data)} dim={data.shape[1]} k={args.k} rescore_factor={args.rescore_factor}")
+    # heap/vector: codes, norm and in-memory originals (`storage.nbytes`) before any save/mmap load
+    print(f"{'storage':<24} {'bytes/vector':>12} {'heap/vector':>11} {'ms/query':>9} {'recall@k':>9}")
+    heap = exact.storage.nbytes // len(data)
+    print(f"{'float32':<24} {exact.storage.nbytes_per_vector:12d} {heap:11d} {exact_ms:9.2f} {1.0:9.3f}")
+    for prefix_dim in args.prefix:
+        for rescore_factor in (0, args.rescore_factor):
+            vector_db = VectorDatabase(storage=PrefixStorage(prefix_dim, rescore_factor=rescore_factor))
+            vector_db.add_many(keys, data)
+            ms, results = timed_search(vector_db, queries, args.k)
+            recall = np.mean([len(want & {key for key, _ in got}) / args.k for want, got in zip(expected, results)])
+            name = f"prefix {prefix_dim}" + (f" + rescore x{rescore_factor}" if rescore_factor else "")
+            heap = vector_db.storage.nbytes // len(data)
+            print(f"{name:<24} {vector_db.storage.nbytes_per_vector:12d} {heap:11d} {ms:9.2f} {recall:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Throughput of VectorDatabase.search_many against looping over search().
+
+Uses random unit vectors so it runs offline; embedding latency is not
+included (search_many_by_text additionally replaces one embedding request
+per query with a single batched request).
+
+    python benchmarks/bench_search_many.py --rows 20000 --queries 500
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aimakerspace.vectordatabase import VectorDatabase
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vector_db = VectorDatabase()
+    vector_db.insert_many(
+        [f"chunk-{i}" for i in range(args.rows)],
+        rng.standard_normal((args.rows, args.dim), dtype=np.float32),
+    )
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+    start = time.perf_counter()
+    looped = [vector_db.search(query, args.k) for query in queries]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = vector_db.search_many(queries, args.k)
+    batch_seconds = time.perf_counter() - start
+
+    assert [[key for key, _ in r] for r in looped] == [[key for key, _ in r] for r in batched]
+
+    print(f"rows={args.rows} dim={args.dim} queries={args.queries} k={args.k}")
+    print(f"search() loop : {args.queries / loop_seconds:10.1f} queries/s")
+    print(f"search_many() : {args.queries / batch_seconds:10.1f} queries/s")
+    print(f"speedup       : {loop_seconds / batch_seconds:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Search latency of ShardedIndex as the worker count grows, against the
+single-pass FlatIndex, for float32 and int8 storage.
+
+BLAS already multithreads the float32 matrix product, so pin it to one
+thread to see the scaling that comes from sharding alone:
+
+    OPENBLAS_NUM_THREADS=1 OMP_NUM_THREADS=1 \\
+        python benchmarks/bench_sharded.py --rows 1000000 --dim 384 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aimakerspace.indexes import FlatIndex, ShardedIndex
+from aimakerspace.storage import Float32Storage, Int8Storage
+
+
+def latency_ms(index, storage, queries, k, repeats):
+    index.search(storage, queries[:1], k)  # warm-up (thread pool, page faults)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for query in queries:
+            index.search(storage, query[None, :], k)
+    return (time.perf_counter() - start) * 1000 / (repeats * len(queries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    print(f"rows={args.rows} dim={args.dim} k={args.k} cpus={os.cpu_count()}")
+    for storage in (Float32Storage(), Int8Storage()):
+        for start in range(0, args.rows, 100_000):
+            block = rng.standard_normal((min(100_000, args.rows - start), args.dim), dtype=np.float32)
+            block /= np.linalg.norm(block, axis=1, keepdims=True)
+            storage.append(block, np.ones(len(block), dtype=np.float32))
+        expected, _ = FlatIndex().search(storage, queries, args.k)
+        flat = latency_ms(FlatIndex(), storage, queries, args.k, args.repeats)
+        print(f"[{storage.name}] flat: {flat:8.1f} ms/query")
+        for workers in args.workers:
+            index = ShardedIndex(max_workers=workers)
+            rows, _ = index.search(storage, queries, args.k)
+            assert (rows == expected).all()
+            sharded = latency_ms(index, storage, queries, args.k, args.repeats)
+            index.close()
+            print(f"[{storage.name}] workers={workers:<3} {sharded:8.1f} ms/query ({flat / sharded:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Save and load times of a VectorDatabase snapshot with metadata and BM25
+enabled, against rebuilding both indexes row by row from the keys and
+metadata columns (what `load` did before their postings were saved).
+
+    python benchmarks/bench_snapshot.py --rows 50000 --dim 1536
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aimakerspace.lexical import BM25Index
+from aimakerspace.metadata import MetadataIndex
+from aimakerspace.vectordatabase import VectorDatabase
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--words", type=int, default=150, help="words per chunk")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocabulary = [f"w{i}" for i in range(30000)]
+    keys = [" ".join(rng.choice(vocabulary) for _ in range(args.words)) for _ in range(args.rows)]
+    vectors = np.random.default_rng(0).standard_normal((args.rows, args.dim), dtype=np.float32)
+    metadata = [{"page": i // 5, "char_start": i * 700, "char_end": i * 700 + 800} for i in range(args.rows)]
+    vector_db = VectorDatabase(lexical=True)
+    vector_db.add_many(keys, vectors, metadata)
+
+    path = tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        vector_db.save(path)
+        save_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = VectorDatabase.load(path, mmap=True)
+        load_seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(path)
+
+    start = time.perf_counter()
+    MetadataIndex().append([loaded.metadata.get(row) for row in range(args.rows)])
+    BM25Index().append(loaded.keys())
+    rebuild_seconds = time.perf_counter() - start
+
+    query = " ".join(keys[0].split()[:3])
+    assert loaded.lexical.search(query, 10)[0].tolist() == vector_db.lexical.search(query, 10)[0].tolist()
+    assert (loaded.metadata.mask({"page": [3, 9]}) == vector_db.metadata.mask({"page": [3, 9]})).all()
+    print(f"rows={args.rows} dim={args.dim} words/chunk={args.words}")
+    print(f"save {save_seconds * 1000:.0f} ms, load {load_seconds * 1000:.0f} ms")
+    print(f"rebuilding metadata + BM25 row by row instead: {rebuild_seconds * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Memory per vector, latency and recall@k of the compressed storages against
+exact float32 storage.
+
+    python benchmarks/bench_storage.py --rows 50000
+    python benchmarks/bench_storage.py --rows 5000 --insert-batch 1
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aimakerspace.storage import Float32Storage, Int8Storage, PQStorage
+from aimakerspace.vectordatabase import VectorDatabase
+
+
+def clustered_vectors(rng, rows, dim, clusters):
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    labels = rng.integers(0, clusters, rows)
+    return centers[labels] + 1.5 * rng.standard_normal((rows, dim), dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--insert-batch", type=int, default=0, help="insert in batches of this size (0: one call)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    corpus = clustered_vectors(rng, args.rows, args.dim, args.clusters)
+    keys = [f"chunk-{i}" for i in range(args.rows)]
+    picks = rng.choice(args.rows, args.queries, replace=False)
+    queries = corpus[picks] + 1.0 * rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+    storages = [
+        ("float32", Float32Storage()),
+        ("int8", Int8Storage()),
+        ("int8 + rescore x4", Int8Storage(rescore_factor=4)),
+        ("pq", PQStorage()),
+        ("pq + rescore x4", PQStorage(rescore_factor=4)),
+    ]
+    truth = None
+    print(f"rows={args.rows} dim={args.dim} k={args.k}")
+    # heap/vector: codes, norm and in-memory originals (`storage.nbytes`) before any save/mmap load
+    print(f"{'storage':<20}{'bytes/vector':>14}{'heap/vector':>13}{'ms/query':>10}{'recall@' + str(args.k):>12}")
+    for label, storage in storages:
+        vector_db = VectorDatabase(storage=storage)
+        step = args.insert_batch or args.rows
+        for start in range(0, args.rows, step):
+            vector_db.insert_many(keys[start : start + step], corpus[start : start + step])
+        start = time.perf_counter()
+        results = [vector_db.search(query, args.k) for query in queries]
+        ms = (time.perf_counter() - start) / args.queries * 1000
+        found = [{key for key, _ in result} for result in results]
+        if truth is None:
+            truth = found
+        recall = np.mean([len(t & f) / len(t) for t, f in zip(truth, found)])
+        heap = storage.nbytes // args.rows
+        print(f"{label:<20}{storage.nbytes_per_vector:>14}{heap:>13}{ms:>10.2f}{recall:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tokens per chunk with chunk_text (characters) vs TokenTextSplitter
+(tokens), on a document that mixes prose, number tables and non-Latin
+text, plus the split time with a cold and a warm token-offset cache.
+
+Uses tiktoken's cl100k_base when installed, else the regex estimate.
+
+    python benchmarks/bench_token_chunking.py --chars 2000000 --chunk-tokens 256
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aimakerspace.text_utils import TokenTextSplitter, chunk_text
+from aimakerspace.tokenization import clear_token_offsets_cache, count_tokens, get_tokenizer, token_offsets
+
+
+def mixed_document(chars: int, rng) -> str:
+    words = ["the", "retrieval", "model", "of", "a", "vector", "embedding", "and", "query", "index"]
+    sections = [
+        lambda: " ".join(rng.choice(words) for _ in range(rng.randint(5, 25))).capitalize() + ". ",
+        lambda: ", ".join(f"{rng.random() * 1e4:.3f}" for _ in range(8)) + "\n",
+        lambda: "".join(chr(rng.randint(0x4E00, 0x4FFF)) for _ in range(rng.randint(10, 40))) + "。",
+    ]
+    parts, length = [], 0
+    while length < chars:
+        kind = rng.choices(range(3), weights=[6, 2, 1])[0]
+        for _ in range(rng.randint(3, 12)):
+            part = sections[kind]()
+            parts.append(part)
+            length += len(part)
+    return "".join(parts)[:chars]
+
+
+def describe(name, counts):
+    counts = np.asarray(counts)
+    print(
+        f"{name:<22} {len(counts):7d} {counts.mean():7.0f} {counts.min():6d} {counts.max():6d} "
+        f"{counts.std() / counts.mean():6.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chars", type=int, default=2_000_000)
+    parser.add_argument("--chunk-tokens", type=int, default=256)
+    parser.add_argument("--overlap-tokens", type=int, default=32)
+    parser.add_argument("--chunk-size", type=int, default=1000, help="characters, for chunk_text")
+    args = parser.parse_args()
+
+    text = mixed_document(args.chars, random.Random(0))
+    splitter = TokenTextSplitter(args.chunk_tokens, args.overlap_tokens)
+    print(f"tokenizer={get_tokenizer().name} chars={len(text)} tokens={len(token_offsets(text))}")
+
+    clear_token_offsets_cache()
+    start = time.perf_counter()
+    chunks = splitter.split(text)
+    cold_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    splitter.split(text)
+    warm_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{'splitter':<22} {'chunks':>7} {'mean':>7} {'min':>6} {'max':>6} {'cv':>6}")
+    describe(f"chunk_text {args.chunk_size}", [count_tokens(chunk) for chunk in chunk_text(text, args.chunk_size)])
+    describe(f"tokens {args.chunk_tokens}", [count_tokens(chunk) for chunk in chunks])
+    print(f"TokenTextSplitter.split: {cold_ms:.0f} ms cold, {warm_ms:.0f} ms with cached offsets")
+
+
+if __name__ == "__main__":
+    main()